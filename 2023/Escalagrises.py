@@ -21,21 +21,22 @@ def detectar_grises_hsv(imagen):
 
     return imagen_gris, mascara_gris
 
-# Cargar la imagen
-imagen_path = "2023/colorimetria.jpg"  # Reemplaza con la ruta de tu imagen
-imagen = cv2.imread(imagen_path)
-
-# Verifica si la imagen fue cargada correctamente
-if imagen is None:
-    print("No se pudo cargar la imagen.")
-else:
-    # Detectar los tonos grises
-    imagen_gris, mascara_gris = detectar_grises_hsv(imagen)
-
-    # Mostrar la imagen con los tonos grises detectados
-    cv2.imshow("Imagen con tonos grises", imagen_gris)
-    cv2.imshow("Máscara de grises", mascara_gris)
-
-    # Espera hasta que se presione una tecla para cerrar
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+if __name__ == "__main__":
+    # Cargar la imagen
+    imagen_path = "2023/colorimetria.jpg"  # Reemplaza con la ruta de tu imagen
+    imagen = cv2.imread(imagen_path)
+
+    # Verifica si la imagen fue cargada correctamente
+    if imagen is None:
+        print("No se pudo cargar la imagen.")
+    else:
+        # Detectar los tonos grises
+        imagen_gris, mascara_gris = detectar_grises_hsv(imagen)
+
+        # Mostrar la imagen con los tonos grises detectados
+        cv2.imshow("Imagen con tonos grises", imagen_gris)
+        cv2.imshow("Máscara de grises", mascara_gris)
+
+        # Espera hasta que se presione una tecla para cerrar
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import pandas as pd
 
 def calcular_cobertura_vegetal_por_cuadrante(imagen, verde_bajo, verde_alto):
     """
@@ -75,6 +74,8 @@ def analizar_cuadriculas(imagen_path, num_filas, num_columnas):
     return resultados_totales
 
 def exportar_a_excel(resultados, archivo_excel="resultados.xlsx"):
+    import pandas as pd
+
     # DATAFRAME PANDA EXCEL
     df = pd.DataFrame(resultados, columns=["Cobertura Vegetal (%)"])
     
@@ -82,14 +83,15 @@ def exportar_a_excel(resultados, archivo_excel="resultados.xlsx"):
     df.to_excel(archivo_excel, index_label="Cuadrícula")
     print(f"Resultados exportados a {archivo_excel} con éxito.")
 
-# Parámetros de ejemplo
-imagen_ejemplo = "2023/Slide1.JPG"  # Cambia esto al nombre de tu imagen
-num_filas = 30
-num_columnas = 15
+if __name__ == "__main__":
+    # Parámetros de ejemplo
+    imagen_ejemplo = "2023/Slide1.JPG"  # Cambia esto al nombre de tu imagen
+    num_filas = 30
+    num_columnas = 15
 
-# Analisis
-resultados = analizar_cuadriculas(imagen_ejemplo, num_filas, num_columnas)
+    # Analisis
+    resultados = analizar_cuadriculas(imagen_ejemplo, num_filas, num_columnas)
 
-# EXp rresultados en excel
-if resultados:
-    exportar_a_excel(resultados)
+    # EXp rresultados en excel
+    if resultados:
+        exportar_a_excel(resultados)
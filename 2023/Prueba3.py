@@ -1,7 +1,5 @@
 import cv2
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
 def calcular_cobertura_vegetal_por_cuadrante(imagen, verde_bajo, verde_alto):
     """
@@ -80,6 +78,8 @@ def analizar_cuadriculas(imagen_path, num_filas, num_columnas):
     return resultados_totales
 
 def exportar_a_excel(resultados, archivo_excel="resultados.xlsx"):
+    import pandas as pd
+
     # Crear un DataFrame de pandas con los resultados
     df = pd.DataFrame(resultados, columns=["Cobertura Vegetal (%)"])
     
@@ -87,14 +87,17 @@ def exportar_a_excel(resultados, archivo_excel="resultados.xlsx"):
     df.to_excel(archivo_excel, index_label="Cuadrícula")
     print(f"Resultados exportados a {archivo_excel} con éxito.")
 
-# Parámetros de ejemplo
-imagen_ejemplo = "2023/Slide1.JPG"
-num_filas = 30
-num_columnas = 15
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    # Parámetros de ejemplo
+    imagen_ejemplo = "2023/Slide1.JPG"
+    num_filas = 30
+    num_columnas = 15
 
-# Ejecutar el análisis
-resultados = analizar_cuadriculas(imagen_ejemplo, num_filas, num_columnas)
+    # Ejecutar el análisis
+    resultados = analizar_cuadriculas(imagen_ejemplo, num_filas, num_columnas)
 
-# Exportar los resultados a Excel
-if resultados:
-    exportar_a_excel(resultados)
+    # Exportar los resultados a Excel
+    if resultados:
+        exportar_a_excel(resultados)
@@ -0,0 +1,53 @@
+"""
+Herramientas reutilizables para el análisis de cobertura por cuadrículas.
+
+Importar el paquete no carga OpenCV ni ningún módulo de análisis: cada nombre se importa
+la primera vez que se usa (por ejemplo, cobertura.analizar_multiple).
+"""
+import importlib
+
+# Nombre público -> módulo que lo define
+_EXPORTADOS = {
+    "analizar_cuadriculas_vectorizado": "vectorizado",
+    "mascara_imagen": "vectorizado",
+    "parametros_de": "vectorizado",
+    "analizar_multiple": "planificador",
+    "Plan": "planificador",
+    "contar_clases": "fusionado",
+    "analizar_cuadriculas_piramide": "piramide",
+    "analizar_cuadrantes": "cuadrantes",
+    "analizar_cuadriculas_vial": "vial",
+    "analizar_cuadriculas_vial_gris": "vial",
+    "analizar_cuadriculas_vial_global": "vial",
+    "analizar_cuadriculas_vial_gris_global": "vial",
+    "IndiceIntegral": "integral",
+    "IndiceHistograma": "histograma",
+    "ClasificadorLUT": "clasificador_lut",
+    "CapaVectorial": "capa_vectorial",
+    "EscritorDiagnostico": "diagnostico",
+    "AtlasDiagnostico": "diagnostico",
+    "CacheResultados": "cache",
+    "CacheImagenes": "carga",
+    "analizar_incremental": "incremental",
+    "HistorialCeldas": "incremental",
+    "crear_exportador": "exportadores",
+    "analizar_archivo_por_franjas": "franjas",
+    "analizar_en_paralelo": "paralelo",
+    "analizar_imagen": "lote",
+    "ejecutar_lote": "lote",
+    "ejecutar_canalizacion": "canalizacion",
+    "cargar_para_analisis": "carga",
+    "instrumentar": "instrumentacion",
+}
+
+__all__ = sorted(_EXPORTADOS)
+
+def __getattr__(nombre):
+    if nombre not in _EXPORTADOS:
+        raise AttributeError(f"module 'cobertura' has no attribute '{nombre}'")
+    valor = getattr(importlib.import_module(f"cobertura.{_EXPORTADOS[nombre]}"), nombre)
+    globals()[nombre] = valor
+    return valor
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTADOS))
@@ -0,0 +1,30 @@
+import importlib
+import sys
+
+# Subcomando -> módulo con la función main(argumentos). Solo se importa el módulo elegido,
+# así "cobertura --help" no carga OpenCV ni numpy.
+COMANDOS = {
+    "lote": ("lote", "Analiza la cobertura por cuadrículas de un lote de imágenes"),
+    "rendimiento": ("rendimiento", "Mide el rendimiento de los análisis con escenas sintéticas"),
+}
+
+def _ayuda():
+    lineas = ["uso: cobertura <comando> [argumentos]", "", "comandos:"]
+    lineas += [f"  {nombre:<13} {descripcion}" for nombre, (_, descripcion) in COMANDOS.items()]
+    lineas += ["", "Use 'cobertura <comando> --help' para ver los argumentos de cada comando."]
+    return "\n".join(lineas)
+
+def main(argumentos=None):
+    argumentos = sys.argv[1:] if argumentos is None else list(argumentos)
+    if not argumentos or argumentos[0] in ("-h", "--help"):
+        print(_ayuda())
+        return 0 if argumentos else 2
+    comando, *resto = argumentos
+    if comando not in COMANDOS:
+        print(f"Comando no reconocido: {comando}\n\n{_ayuda()}", file=sys.stderr)
+        return 2
+    modulo = importlib.import_module(f"cobertura.{COMANDOS[comando][0]}")
+    return modulo.main(resto)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "cobertura", "resultados")
+
+# Forma parte de todas las claves: se incrementa cuando cambia el resultado de algún analizador
+# con los mismos parámetros (por ejemplo, un umbral fijo dentro del código)
+VERSION_ANALISIS = 1
+
+def huella_archivo(ruta, tamano_bloque=1 << 20):
+    """
+    Hash SHA-256 del contenido de un archivo, sin decodificar la imagen.
+    """
+    hash_archivo = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b""):
+            hash_archivo.update(bloque)
+    return hash_archivo.hexdigest()
+
+def recortar_directorio(directorio, max_bytes, extension):
+    """
+    Elimina los archivos con la extensión dada usados hace más tiempo (según su fecha de
+    modificación) hasta que el total quede por debajo de max_bytes.
+    """
+    entradas = []
+    for nombre in os.listdir(directorio):
+        if nombre.endswith(extension):
+            try:
+                estado = os.stat(os.path.join(directorio, nombre))
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, nombre))
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, nombre in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directorio, nombre))
+        except OSError:
+            # Ya se eliminó o, en Windows, otro proceso lo tiene abierto
+            continue
+        total -= tamano
+
+def huella_arreglo(imagen):
+    """
+    Hash de los píxeles de una imagen ya cargada (incluye forma y tipo de dato).
+    """
+    hash_imagen = hashlib.blake2b(f"{imagen.shape}{imagen.dtype}".encode())
+    hash_imagen.update(np.ascontiguousarray(imagen).data)
+    return hash_imagen.hexdigest()
+
+class CacheResultados:
+    """
+    Caché en disco de matrices de resultados (y opcionalmente máscaras), indexada por el
+    contenido de la imagen y los parámetros del análisis. Cuando supera max_bytes se
+    eliminan las entradas usadas hace más tiempo.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE, max_bytes=512 * 1024**2):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+
+    @staticmethod
+    def clave(huella, **parametros):
+        """
+        Clave de una entrada: huella de la imagen más análisis, rangos HSV, umbrales y cuadrícula.
+        """
+        descripcion = json.dumps(parametros, sort_keys=True, default=lambda valor: np.asarray(valor).tolist())
+        return hashlib.sha256(f"{huella}|{descripcion}".encode()).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.npz")
+
+    def obtener(self, clave, con_mascaras=False):
+        """
+        Devuelve el diccionario tipo -> matriz guardado, o None si no está en la caché.
+        Con con_mascaras=True devuelve también las máscaras guardadas (tipo -> máscara).
+        """
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta) as datos:
+                resultados = {k: datos[k] for k in datos.files if not k.startswith("mascara::")}
+                mascaras = ({k.split("::", 1)[1]: datos[k] for k in datos.files if k.startswith("mascara::")}
+                            if con_mascaras else None)
+            os.utime(ruta)  # Marca la entrada como usada recientemente
+        except (FileNotFoundError, ValueError, OSError, EOFError, zipfile.BadZipFile):
+            # Entrada inexistente, truncada o corrupta: se trata como ausente y se recalcula
+            return None
+        return (resultados, mascaras) if con_mascaras else resultados
+
+    def guardar(self, clave, resultados, mascaras=None):
+        """
+        Guarda los resultados (y máscaras) de forma atómica y aplica el límite de tamaño.
+        """
+        arreglos = dict(resultados)
+        arreglos.update({f"mascara::{tipo}": mascara for tipo, mascara in (mascaras or {}).items()})
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as archivo:
+            np.savez_compressed(archivo, **arreglos)
+        os.replace(temporal, self._ruta(clave))
+        self.recortar()
+
+    def recortar(self):
+        """
+        Elimina las entradas menos usadas hasta quedar por debajo de max_bytes.
+        """
+        recortar_directorio(self.directorio, self.max_bytes, ".npz")
+
+def con_cache(funcion):
+    """
+    Decorador para los analizadores (imagen, num_filas, num_columnas, ...): agrega el argumento
+    opcional cache (CacheResultados). Si la imagen y los parámetros ya se analizaron, se devuelve
+    el resultado guardado. La clave incluye el nombre completo del analizador, VERSION_ANALISIS
+    y los parámetros por defecto de cada tipo (PARAMETROS), además de los argumentos.
+    No se usa la caché cuando se piden salidas adicionales (diagnóstico, imagen_lineas o capa),
+    porque esas no se guardan.
+    """
+    firma = inspect.signature(funcion)
+
+    @functools.wraps(funcion)
+    def envoltura(imagen, *args, cache=None, **kwargs):
+        if cache is None:
+            return funcion(imagen, *args, **kwargs)
+        argumentos = firma.bind(imagen, *args, **kwargs)
+        argumentos.apply_defaults()
+        argumentos = dict(argumentos.arguments)
+        for nombre, parametro in firma.parameters.items():
+            if parametro.kind is inspect.Parameter.VAR_KEYWORD:
+                argumentos.update(argumentos.pop(nombre))
+        del argumentos[next(iter(firma.parameters))]
+        salidas = [argumentos.pop(nombre, None) for nombre in ("diagnostico", "imagen_lineas", "capa")]
+        if any(salida is not None and salida is not False for salida in salidas):
+            return funcion(imagen, *args, **kwargs)
+
+        # Importación diferida: cobertura.vectorizado usa este decorador
+        from cobertura.vectorizado import PARAMETROS
+
+        clave = cache.clave(huella_arreglo(imagen), analizador=f"{funcion.__module__}.{funcion.__qualname__}",
+                            version=VERSION_ANALISIS, por_defecto=PARAMETROS, **argumentos)
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            return guardado.get("__matriz__", guardado)
+        resultado = funcion(imagen, *args, **kwargs)
+        cache.guardar(clave, resultado if isinstance(resultado, dict) else {"__matriz__": resultado})
+        return resultado
+
+    return envoltura
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from cobertura.cache import CacheResultados
+from cobertura.carga import CacheImagenes, cargar_para_analisis
+from cobertura.instrumentacion import Registro, activar, desactivar, etapa, registro_activo
+from cobertura.lote import analizar_imagen, analizar_imagen_incremental, clave_resultados, rondas_incrementales
+from cobertura.vectorizado import tamano_cuadricula
+
+# Etapas de la canalización, en orden; superponer solo se usa si se pide un directorio de salida
+ETAPAS = ("decodificar", "analizar", "superponer", "exportar")
+
+# Tareas simultáneas por etapa. Exportar escribe en un único archivo, así que siempre es 1.
+CONCURRENCIA = {"decodificar": 2, "analizar": os.cpu_count() or 1, "superponer": 1, "exportar": 1}
+
+# Marca de fin que recibe cada tarea de una etapa cuando la etapa anterior terminó
+_FIN = object()
+
+def superponer_resultados(imagen, matriz, alfa=0.4):
+    """
+    Colorea cada cuadrícula según su cobertura (0 a 100) sobre la imagen y dibuja la cuadrícula
+    en rojo, como superponer_cuadriculas_en_imagen de 375.py.
+    """
+    num_filas, num_columnas = np.shape(matriz)
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    if zona.ndim == 2:
+        zona = cv2.cvtColor(zona, cv2.COLOR_GRAY2BGR)
+    with etapa("superponer", zona.shape[0] * zona.shape[1]):
+        niveles = (np.clip(matriz, 0, 100) * 255 // 100).astype(np.uint8)
+        niveles = cv2.resize(niveles, (zona.shape[1], zona.shape[0]), interpolation=cv2.INTER_NEAREST)
+        salida = cv2.addWeighted(zona, 1 - alfa, cv2.applyColorMap(niveles, cv2.COLORMAP_JET), alfa, 0)
+        salida[::alto_cuadricula] = (0, 0, 255)
+        salida[:, ::ancho_cuadricula] = (0, 0, 255)
+    return salida
+
+def _guardar_superposicion(imagen, resultados, ruta_salida):
+    for tipo, matriz in resultados.items():
+        base, extension = os.path.splitext(ruta_salida)
+        with etapa("superponer_imwrite") as medicion:
+            cv2.imwrite(f"{base}_{tipo}{extension}", superponer_resultados(imagen, matriz))
+            if medicion:
+                medicion.agregar(bytes_escritos=os.path.getsize(f"{base}_{tipo}{extension}"))
+
+def _analizar(imagen, nombre, num_filas, num_columnas, analisis, umbral_longitud, directorio_incremental, tolerancia):
+    # Función de nivel de módulo para poder enviarla a un proceso trabajador
+    if not directorio_incremental:
+        return analizar_imagen(imagen, num_filas, num_columnas, analisis, umbral_longitud), {}
+    return analizar_imagen_incremental(imagen, nombre, num_filas, num_columnas, analisis, umbral_longitud,
+                                       directorio_incremental, tolerancia)
+
+def _buscar_en_cache(cache, ruta, num_filas, num_columnas, analisis, umbral_longitud, min_pixeles_celda):
+    # Devuelve la clave de la imagen y sus resultados guardados, o None si no están en la caché
+    clave = clave_resultados(cache, ruta, num_filas, num_columnas, analisis, umbral_longitud, min_pixeles_celda)
+    guardado = cache.obtener(clave)
+    return clave, None if guardado is None else {tipo: guardado[tipo] for tipo in analisis}
+
+def _analizar_en_trabajador(instrumentado, *argumentos):
+    # Como _procesar_en_trabajador de cobertura.lote: el proceso trabajador mide en un registro
+    # propio y devuelve sus eventos para sumarlos al registro activo de la canalización
+    registro = activar(Registro()) if instrumentado else None
+    try:
+        resultados, celdas = _analizar(*argumentos)
+        return resultados, celdas, registro.eventos if registro else []
+    finally:
+        if registro is not None:
+            desactivar()
+
+async def _correr_etapa(procesar, entrada, salida, concurrencia, errores):
+    # Cada tarea toma imágenes de la cola de entrada hasta recibir _FIN. put() espera cuando
+    # la cola de salida está llena, así una etapa lenta frena a las anteriores.
+    async def tarea():
+        while True:
+            elemento = await entrada.get()
+            if elemento is _FIN:
+                return
+            ruta, datos = elemento
+            try:
+                datos = await procesar(ruta, datos)
+            except Exception as error:
+                errores[ruta] = str(error)
+                continue
+            if salida is not None:
+                await salida.put((ruta, datos))
+
+    await asyncio.gather(*(tarea() for _ in range(concurrencia)))
+
+async def _ejecutar(rutas, num_filas, num_columnas, analisis, umbral_longitud, exportador, directorio_superposiciones,
+                    concurrencia, max_pendientes, procesos, directorio_incremental, tolerancia, min_pixeles_celda,
+                    directorio_imagenes, directorio_cache, informe):
+    bucle = asyncio.get_running_loop()
+    resultados = {}
+    errores = {}
+    etapas = [nombre for nombre in ETAPAS if nombre != "superponer" or directorio_superposiciones]
+    cache_imagenes = CacheImagenes(directorio_imagenes) if directorio_imagenes else None
+    cache = CacheResultados(directorio_cache) if directorio_cache else None
+    # Los hilos miden en el registro activo; los procesos devuelven sus eventos para sumarlos
+    registro = registro_activo()
+
+    # Un ejecutor por etapa, para que una etapa lenta no ocupe los hilos de las demás
+    ejecutores = {nombre: ThreadPoolExecutor(concurrencia[nombre], thread_name_prefix=nombre) for nombre in etapas}
+    if procesos:
+        ejecutores["analizar"].shutdown()
+        ejecutores["analizar"] = ProcessPoolExecutor(concurrencia["analizar"])
+
+    async def decodificar_ruta(ruta, datos):
+        datos = {}
+        if cache is not None:
+            datos["clave"], guardado = await bucle.run_in_executor(
+                ejecutores["decodificar"], _buscar_en_cache, cache, ruta, num_filas, num_columnas, analisis,
+                umbral_longitud, min_pixeles_celda
+            )
+            if guardado is not None:
+                # Resultados ya calculados: solo se decodifica la imagen si hay que superponerlos
+                datos["resultados"] = guardado
+                if not directorio_superposiciones:
+                    return datos
+        # OpenCV libera el GIL al decodificar, así que la decodificación puede hacerse en hilos
+        datos["imagen"] = await bucle.run_in_executor(ejecutores["decodificar"], cargar_para_analisis, ruta,
+                                                      analisis, num_filas, num_columnas, min_pixeles_celda,
+                                                      cache_imagenes)
+        return datos
+
+    async def analizar_ruta(ruta, datos):
+        if "resultados" in datos:
+            if informe is not None and directorio_incremental:
+                informe["reutilizadas"] = informe.get("reutilizadas", 0) + num_filas * num_columnas
+            return datos
+        argumentos = (datos["imagen"], os.path.basename(ruta), num_filas, num_columnas, analisis, umbral_longitud,
+                      directorio_incremental, tolerancia)
+        if procesos:
+            datos["resultados"], celdas, eventos = await bucle.run_in_executor(
+                ejecutores["analizar"], _analizar_en_trabajador, registro is not None, *argumentos
+            )
+            if registro is not None:
+                registro.fusionar(eventos)
+        else:
+            datos["resultados"], celdas = await bucle.run_in_executor(ejecutores["analizar"], _analizar, *argumentos)
+        if informe is not None:
+            for clave, cantidad in celdas.items():
+                informe[clave] = informe.get(clave, 0) + cantidad
+        if cache is not None:
+            await bucle.run_in_executor(ejecutores["decodificar"], cache.guardar, datos["clave"], datos["resultados"])
+        return datos
+
+    async def superponer_ruta(ruta, datos):
+        nombre = os.path.splitext(os.path.basename(ruta))[0]
+        await bucle.run_in_executor(ejecutores["superponer"], _guardar_superposicion, datos["imagen"],
+                                    datos["resultados"], os.path.join(directorio_superposiciones, f"{nombre}.jpg"))
+        return datos
+
+    async def exportar_ruta(ruta, datos):
+        if exportador is not None:
+            await bucle.run_in_executor(ejecutores["exportar"], exportador.agregar_matrices, ruta, datos["resultados"])
+        # La imagen ya no se necesita: solo se conservan las matrices, y solo si se exportaron
+        resultados[ruta] = datos["resultados"]
+
+    procesadores = {"decodificar": decodificar_ruta, "analizar": analizar_ruta, "superponer": superponer_ruta,
+                    "exportar": exportar_ruta}
+    colas = [asyncio.Queue(max_pendientes) for _ in etapas]
+
+    async def correr(indice, nombre):
+        salida = colas[indice + 1] if indice + 1 < len(etapas) else None
+        await _correr_etapa(procesadores[nombre], colas[indice], salida, concurrencia[nombre], errores)
+        if salida is not None:
+            for _ in range(concurrencia[etapas[indice + 1]]):
+                await salida.put(_FIN)
+
+    async def alimentar():
+        for ruta in rutas:
+            await colas[0].put((ruta, None))
+        for _ in range(concurrencia[etapas[0]]):
+            await colas[0].put(_FIN)
+
+    try:
+        await asyncio.gather(alimentar(), *(correr(indice, nombre) for indice, nombre in enumerate(etapas)))
+    finally:
+        for ejecutor in ejecutores.values():
+            ejecutor.shutdown()
+    return resultados, errores
+
+def ejecutar_canalizacion(rutas, num_filas, num_columnas, analisis, umbral_longitud=50, exportador=None,
+                          directorio_superposiciones=None, concurrencia=None, max_pendientes=2, procesos=False,
+                          directorio_incremental=None, tolerancia=0, min_pixeles_celda=None, directorio_imagenes=None,
+                          directorio_cache=None, informe=None):
+    """
+    Analiza un lote como una canalización de etapas que trabajan a la vez sobre imágenes
+    distintas: decodificar, analizar, superponer (si se indica directorio_superposiciones)
+    y exportar. Entre etapas hay colas de max_pendientes imágenes, de modo que el lote avanza
+    al ritmo de la etapa más lenta sin acumular imágenes decodificadas en memoria.
+    concurrencia reemplaza las tareas simultáneas por etapa de CONCURRENCIA. El análisis se
+    hace en hilos (OpenCV libera el GIL) o, con procesos=True, en procesos, a costa de copiar
+    cada imagen al trabajador.
+    min_pixeles_celda, directorio_imagenes y directorio_cache se usan como en procesar_imagen:
+    una imagen que está en la caché de resultados no se analiza, y solo se decodifica si hay
+    que superponer sus resultados. Con directorio_incremental, las imágenes con el mismo
+    nombre de archivo pasan por la canalización en rondas sucesivas (ver rondas_incrementales).
+    Devuelve lo mismo que ejecutar_lote: resultados por ruta, errores por ruta y segundos.
+    """
+    concurrencia = {**CONCURRENCIA, **(concurrencia or {}), "exportar": 1}
+    if directorio_superposiciones:
+        os.makedirs(directorio_superposiciones, exist_ok=True)
+    inicio = time.perf_counter()
+    resultados, errores = {}, {}
+    for ronda in rondas_incrementales(rutas) if directorio_incremental else [rutas]:
+        resultados_ronda, errores_ronda = asyncio.run(_ejecutar(
+            ronda, num_filas, num_columnas, analisis, umbral_longitud, exportador, directorio_superposiciones,
+            concurrencia, max_pendientes, procesos, directorio_incremental, tolerancia, min_pixeles_celda,
+            directorio_imagenes, directorio_cache, informe
+        ))
+        resultados.update(resultados_ronda)
+        errores.update(errores_ronda)
+    return resultados, errores, time.perf_counter() - inicio
@@ -0,0 +1,104 @@
+import json
+
+import cv2
+import numpy as np
+
+class CapaVectorial:
+    """
+    Geometría detectada (segmentos de Hough y contornos) guardada como arreglos de NumPy en
+    coordenadas de la imagen, en lugar de dibujarla sobre una copia a resolución completa.
+    Se puede exportar a GeoJSON/SVG o rasterizar a la resolución que se necesite.
+    """
+
+    def __init__(self, alto, ancho):
+        self.alto = alto
+        self.ancho = ancho
+        self._segmentos = []
+        self._puntos = []
+        self._tamanos = []
+
+    def agregar_segmentos(self, segmentos, x_offset=0, y_offset=0):
+        """
+        Agrega segmentos (x1, y1, x2, y2), desplazados a coordenadas de la imagen completa.
+        """
+        segmentos = np.asarray(segmentos, dtype=np.int32).reshape(-1, 4)
+        if len(segmentos):
+            self._segmentos.append(segmentos + np.array([x_offset, y_offset, x_offset, y_offset], dtype=np.int32))
+
+    def agregar_polilineas(self, polilineas, x_offset=0, y_offset=0):
+        """
+        Agrega contornos de OpenCV, desplazados a coordenadas de la imagen. Se tratan como
+        polilíneas cerradas, igual que al dibujarlos con cv2.drawContours.
+        """
+        for polilinea in polilineas:
+            puntos = np.asarray(polilinea, dtype=np.int32).reshape(-1, 2)
+            self._puntos.append(puntos + np.array([x_offset, y_offset], dtype=np.int32))
+            self._tamanos.append(len(puntos))
+
+    @property
+    def segmentos(self):
+        if not self._segmentos:
+            return np.zeros((0, 4), dtype=np.int32)
+        if len(self._segmentos) > 1:
+            self._segmentos = [np.concatenate(self._segmentos)]
+        return self._segmentos[0]
+
+    @property
+    def polilineas(self):
+        if not self._puntos:
+            return []
+        if len(self._puntos) > 1:
+            self._puntos = [np.concatenate(self._puntos)]
+        return np.split(self._puntos[0], np.cumsum(self._tamanos)[:-1])
+
+    def a_geojson(self, ruta):
+        """
+        Exporta la capa como FeatureCollection de LineString en coordenadas de píxel (y hacia abajo).
+        """
+        elementos = [
+            {"type": "Feature", "properties": {"tipo": "segmento"},
+             "geometry": {"type": "LineString", "coordinates": segmento.reshape(2, 2).tolist()}}
+            for segmento in self.segmentos
+        ] + [
+            {"type": "Feature", "properties": {"tipo": "contorno"},
+             "geometry": {"type": "LineString", "coordinates": polilinea.tolist() + polilinea[:1].tolist()}}
+            for polilinea in self.polilineas
+        ]
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump({"type": "FeatureCollection", "features": elementos}, archivo)
+
+    def a_svg(self, ruta, grosor=2):
+        """
+        Exporta la capa como SVG del tamaño de la imagen, con un único path por tipo de geometría.
+        """
+        trazo_segmentos = " ".join(f"M{x1} {y1}L{x2} {y2}" for x1, y1, x2, y2 in self.segmentos.tolist())
+        trazo_contornos = " ".join(
+            "M" + "L".join(f"{x} {y}" for x, y in polilinea.tolist()) + "Z" for polilinea in self.polilineas
+        )
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            archivo.write(
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.ancho}" height="{self.alto}" '
+                f'viewBox="0 0 {self.ancho} {self.alto}">\n'
+                f'<path d="{trazo_segmentos}" stroke="red" stroke-width="{grosor}" fill="none"/>\n'
+                f'<path d="{trazo_contornos}" stroke="lime" stroke-width="{grosor}" fill="none"/>\n'
+                "</svg>\n"
+            )
+
+    def rasterizar(self, fondo=None, escala=1.0, grosor=2):
+        """
+        Dibuja la capa a la escala pedida, sobre el fondo dado (que se redimensiona) o sobre negro.
+        Todas las líneas de cada tipo se dibujan con una sola llamada a cv2.polylines.
+        """
+        alto, ancho = int(round(self.alto * escala)), int(round(self.ancho * escala))
+        if fondo is None:
+            salida = np.zeros((alto, ancho, 3), dtype=np.uint8)
+        else:
+            salida = cv2.resize(fondo, (ancho, alto), interpolation=cv2.INTER_AREA)
+
+        segmentos = np.round(self.segmentos.reshape(-1, 2, 2) * escala).astype(np.int32)
+        if len(segmentos):
+            cv2.polylines(salida, list(segmentos), False, (0, 0, 255), grosor)
+        polilineas = [np.round(polilinea * escala).astype(np.int32) for polilinea in self.polilineas]
+        if polilineas:
+            cv2.polylines(salida, polilineas, True, (0, 255, 0), grosor)
+        return salida
@@ -0,0 +1,197 @@
+import os
+import struct
+import tempfile
+
+import cv2
+import numpy as np
+
+from cobertura.cache import huella_archivo, recortar_directorio
+from cobertura.instrumentacion import etapa
+
+DIRECTORIO_IMAGENES = os.path.join(os.path.expanduser("~"), ".cache", "cobertura", "imagenes")
+
+# Conversiones de una imagen BGR que pueden guardarse en la caché junto con la imagen
+CONVERSIONES = {"hsv": cv2.COLOR_BGR2HSV, "gris": cv2.COLOR_BGR2GRAY}
+
+# Análisis que solo usan la imagen en gris; si todos los pedidos lo son, se decodifica en gris
+ANALISIS_GRISES = ("urbanistico", "vial", "vial_hough", "vial_global")
+
+# Análisis de área (porcentajes por cuadrícula) que admiten decodificar la imagen reducida. El
+# resultado es aproximado: INTER_AREA promedia los colores antes de aplicar el rango HSV o el
+# umbral de gris, así que los píxeles cerca del umbral cambian de clase. En las imágenes del
+# repositorio, con cuadrícula 30x15 y factor 2, cambian 3-28 de 450 cuadrículas en vegetal y
+# 7-100 en urbanistico, y más con factor 4 u 8. Los viales no la admiten: Canny y Hough
+# encuentran otros bordes y otras líneas en la imagen reducida.
+ANALISIS_ESCALABLES = ("vegetal", "urbanistico")
+
+# Factor de reducción -> (banderas en color, banderas en gris) de cv2.imread. Con JPEG la
+# reducción se hace al decodificar (escalado de la DCT), sin decodificar la imagen completa.
+LECTURAS_REDUCIDAS = {
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+}
+
+# Marcadores SOF de JPEG (los que contienen alto y ancho)
+_MARCADORES_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def dimensiones_imagen(ruta):
+    """
+    Lee el alto y el ancho de la cabecera de un PNG o un JPEG sin decodificar los píxeles.
+    Devuelve None para otros formatos o si la cabecera no se reconoce.
+    """
+    with open(ruta, "rb") as archivo:
+        cabecera = archivo.read(24)
+        if cabecera[:8] == b"\x89PNG\r\n\x1a\n" and cabecera[12:16] == b"IHDR":
+            ancho, alto = struct.unpack(">II", cabecera[16:24])
+            return alto, ancho
+        if cabecera[:2] != b"\xff\xd8":
+            return None
+        archivo.seek(2)
+        while True:
+            marcador = archivo.read(4)
+            if len(marcador) < 4 or marcador[0] != 0xFF:
+                return None
+            longitud = struct.unpack(">H", marcador[2:])[0]
+            if marcador[1] in _MARCADORES_SOF:
+                alto, ancho = struct.unpack(">xHH", archivo.read(5))
+                return alto, ancho
+            archivo.seek(longitud - 2, 1)
+
+def leer_imagen(ruta, banderas=cv2.IMREAD_COLOR, cache=None):
+    """
+    Decodifica la imagen como cv2.imread (devuelve None si no se puede). Si se pasa una
+    CacheImagenes, la imagen se toma de ella o se guarda en ella; entonces es de solo lectura.
+    """
+    if cache is not None:
+        return cache.leer(ruta, banderas)
+    with etapa("imread") as medicion:
+        imagen = cv2.imread(ruta, banderas)
+        if medicion and imagen is not None:
+            medicion.agregar(pixeles=imagen.shape[0] * imagen.shape[1])
+    return imagen
+
+class CacheImagenes:
+    """
+    Caché en disco de imágenes ya decodificadas, indexada por la huella del archivo y las
+    banderas de lectura. Cada imagen se guarda como un .npy sin comprimir y se abre con
+    np.load(mmap_mode="r"): no se decodifica ni se copia, y los procesos que leen la misma
+    imagen comparten sus páginas en la caché del sistema operativo. Por eso las imágenes
+    devueltas son de solo lectura. Cuando supera max_bytes se eliminan las usadas hace más tiempo.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_IMAGENES, max_bytes=2 * 1024**3):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, huella, variante):
+        return os.path.join(self.directorio, f"{huella}_{variante}.npy")
+
+    def obtener(self, huella, variante):
+        """
+        Devuelve la imagen guardada (proyectada en memoria) o None si no está en la caché.
+        """
+        ruta = self._ruta(huella, variante)
+        try:
+            imagen = np.load(ruta, mmap_mode="r")
+            os.utime(ruta)  # Marca la entrada como usada recientemente
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        return imagen
+
+    def guardar(self, huella, variante, imagen):
+        """
+        Guarda la imagen de forma atómica y aplica el límite de tamaño.
+        """
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as archivo:
+            np.save(archivo, imagen)
+        os.replace(temporal, self._ruta(huella, variante))
+        recortar_directorio(self.directorio, self.max_bytes, ".npy")
+
+    def leer(self, ruta, banderas=cv2.IMREAD_COLOR, conversion=None, huella=None):
+        """
+        Como cv2.imread, pero solo decodifica el archivo la primera vez. Con conversion ("hsv"
+        o "gris", sobre una lectura en color) devuelve la imagen convertida, que también se
+        guarda. Devuelve None si el archivo no se puede decodificar.
+        """
+        if huella is None:
+            try:
+                huella = huella_archivo(ruta)
+            except OSError:
+                # Archivo inexistente o ilegible: None, igual que cv2.imread
+                return None
+        variante = f"{banderas}_{conversion}" if conversion else str(banderas)
+        with etapa("cache_imagenes") as medicion:
+            imagen = self.obtener(huella, variante)
+            if medicion and imagen is not None:
+                medicion.agregar(pixeles=imagen.shape[0] * imagen.shape[1])
+        if imagen is not None:
+            return imagen
+
+        if conversion:
+            original = self.leer(ruta, banderas, huella=huella)
+            if original is None:
+                return None
+            with etapa(f"conversion_{conversion}", original.shape[0] * original.shape[1]):
+                imagen = cv2.cvtColor(original, CONVERSIONES[conversion])
+        else:
+            imagen = leer_imagen(ruta, banderas)
+            if imagen is None:
+                return None
+        self.guardar(huella, variante, imagen)
+        # Se devuelve la copia proyectada, de solo lectura como en las próximas lecturas
+        guardada = self.obtener(huella, variante)
+        return imagen if guardada is None else guardada
+
+def elegir_lectura(analisis, dimensiones, num_filas, num_columnas, min_pixeles_celda=None):
+    """
+    Elige cómo decodificar para los análisis pedidos: en gris si ninguno necesita color, y
+    reducida 2, 4 u 8 veces si todos toleran la reducción y cada cuadrícula conserva al menos
+    min_pixeles_celda píxeles de alto y de ancho. Devuelve (gris, factor).
+    """
+    gris = all(tipo in ANALISIS_GRISES for tipo in analisis)
+    if not min_pixeles_celda or dimensiones is None or not all(tipo in ANALISIS_ESCALABLES for tipo in analisis):
+        return gris, 1
+    alto_cuadricula, ancho_cuadricula = dimensiones[0] // num_filas, dimensiones[1] // num_columnas
+    for factor in LECTURAS_REDUCIDAS:
+        if min(alto_cuadricula, ancho_cuadricula) // factor >= min_pixeles_celda:
+            return gris, factor
+    return gris, 1
+
+def _alinear_cuadricula(reducida, dimensiones, num_filas, num_columnas, factor):
+    # Las cuadrículas de la imagen original miden alto // num_filas píxeles, que en general no
+    # es múltiplo del factor: se recorta la zona cubierta y se lleva a un número entero de
+    # píxeles por cuadrícula para que cada cuadrícula reducida cubra la misma zona que la original
+    alto_cuadricula, ancho_cuadricula = dimensiones[0] // num_filas, dimensiones[1] // num_columnas
+    alto_reducido = max(1, round(alto_cuadricula / factor))
+    ancho_reducido = max(1, round(ancho_cuadricula / factor))
+    zona = reducida[:round(num_filas * alto_cuadricula / factor), :round(num_columnas * ancho_cuadricula / factor)]
+    alineada = cv2.resize(zona, (num_columnas * ancho_reducido, num_filas * alto_reducido),
+                          interpolation=cv2.INTER_AREA)
+    return alineada
+
+def cargar_para_analisis(ruta, analisis, num_filas, num_columnas, min_pixeles_celda=None, cache=None):
+    """
+    Carga la imagen con la decodificación más barata que admiten los análisis (ver
+    elegir_lectura). La imagen reducida tiene la misma cuadrícula que la original, pero sus
+    resultados son aproximados (ver ANALISIS_ESCALABLES). Con min_pixeles_celda=None solo se
+    evita la conversión a color cuando todos los análisis son en gris.
+    Con cache (CacheImagenes) la lectura elegida se decodifica una sola vez.
+    """
+    dimensiones = dimensiones_imagen(ruta) if min_pixeles_celda else None
+    gris, factor = elegir_lectura(analisis, dimensiones, num_filas, num_columnas, min_pixeles_celda)
+    banderas = LECTURAS_REDUCIDAS[factor][gris] if factor > 1 else (cv2.IMREAD_GRAYSCALE if gris else cv2.IMREAD_COLOR)
+    imagen = leer_imagen(ruta, banderas, cache)
+    if imagen is None:
+        raise ValueError(f"No se pudo cargar la imagen: {ruta}")
+    if factor == 1:
+        return imagen
+
+    # Si la orientación EXIF giró la imagen, la cabecera no describe la imagen decodificada
+    alto, ancho = dimensiones
+    if abs(imagen.shape[0] * factor - alto) > factor or abs(imagen.shape[1] * factor - ancho) > factor:
+        return cargar_para_analisis(ruta, analisis, num_filas, num_columnas, cache=cache)
+    with etapa("alinear_cuadricula", imagen.shape[0] * imagen.shape[1]):
+        return _alinear_cuadricula(imagen, dimensiones, num_filas, num_columnas, factor)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from cobertura.instrumentacion import etapa
+
+DIRECTORIO_TABLAS = os.path.join(os.path.expanduser("~"), ".cache", "cobertura", "tablas")
+
+# Número de colores BGR de 8 bits por canal
+TOTAL_COLORES = 1 << 24
+
+# Tablas ya construidas o cargadas en este proceso: clave -> ClasificadorLUT
+_tablas_en_memoria = {}
+
+def _normalizar_reglas(reglas):
+    # Cada clase puede tener un rango (bajo, alto) o una lista de rangos que se unen
+    normalizadas = {}
+    for clase, rangos in reglas.items():
+        rangos = np.asarray(rangos, dtype=int)
+        if rangos.ndim == 2:
+            rangos = rangos[None]
+        if rangos.ndim != 3 or rangos.shape[1:] != (2, 3):
+            raise ValueError(f"Rango HSV no válido para la clase '{clase}'.")
+        normalizadas[clase] = [tuple(map(tuple, rango.tolist())) for rango in rangos]
+    if not 0 < len(normalizadas) <= 8:
+        raise ValueError("Una tabla admite entre 1 y 8 clases.")
+    return normalizadas
+
+def indices_de_color(imagen):
+    """
+    Índice de 24 bits de cada píxel BGR: b + 256 * g + 65536 * r.
+    """
+    bgra = cv2.cvtColor(imagen, cv2.COLOR_BGR2BGRA)
+    return bgra.view(np.uint32)[..., 0] & 0xFFFFFF
+
+class ClasificadorLUT:
+    """
+    Clasificador de colores precalculado: una tabla de 16M entradas (una por color BGR) donde
+    el bit i indica si el color pertenece a la clase i. Cada clase se define con uno o varios
+    rangos HSV, igual que cv2.inRange, y el resultado coincide con cvtColor + inRange.
+    Clasificar una imagen es una sola lectura de la tabla por píxel.
+    """
+
+    def __init__(self, clases, tabla):
+        self.clases = list(clases)
+        self.tabla = tabla
+
+    @classmethod
+    def desde_reglas(cls, reglas):
+        """
+        Construye la tabla convirtiendo a HSV los 16M colores posibles una sola vez.
+        reglas es un diccionario clase -> (bajo, alto) o clase -> [(bajo, alto), ...].
+        """
+        reglas = _normalizar_reglas(reglas)
+        colores = np.arange(TOTAL_COLORES, dtype=np.uint32).view(np.uint8).reshape(4096, 4096, 4)
+        hsv = cv2.cvtColor(np.ascontiguousarray(colores[..., :3]), cv2.COLOR_BGR2HSV)
+        del colores
+
+        tabla = np.zeros(TOTAL_COLORES, dtype=np.uint8)
+        for bit, rangos in enumerate(reglas.values()):
+            mascara = np.zeros((4096, 4096), dtype=np.uint8)
+            for bajo, alto in rangos:
+                cv2.bitwise_or(mascara, cv2.inRange(hsv, np.array(bajo), np.array(alto)), dst=mascara)
+            tabla |= (mascara.ravel() & (1 << bit))
+        return cls(reglas, tabla)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Carga una tabla guardada con guardar(): un plano de bits empaquetado (2 MB) por clase.
+        """
+        with np.load(ruta) as datos:
+            clases = [str(clase) for clase in datos["clases"]]
+            tabla = np.zeros(TOTAL_COLORES, dtype=np.uint8)
+            for bit in range(len(clases)):
+                tabla |= np.unpackbits(datos[f"bits_{bit}"], bitorder="little") << bit
+        return cls(clases, tabla)
+
+    def guardar(self, ruta):
+        """
+        Guarda la tabla de forma atómica como planos de bits empaquetados.
+        """
+        planos = {f"bits_{bit}": np.packbits((self.tabla >> bit) & 1, bitorder="little")
+                  for bit in range(len(self.clases))}
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as archivo:
+            np.savez_compressed(archivo, clases=np.array(self.clases), **planos)
+        os.replace(temporal, ruta)
+
+    def clasificar(self, imagen):
+        """
+        Devuelve una imagen uint8 donde el bit i de cada píxel indica la clase i.
+        """
+        return self.tabla[indices_de_color(imagen)]
+
+    def mascara(self, imagen, clase):
+        """
+        Máscara 0/255 de una clase, igual a la que devuelve cv2.inRange sobre la imagen en HSV.
+        """
+        bit = self.clases.index(clase)
+        return ((self.clasificar(imagen) >> bit) & 1) * np.uint8(255)
+
+    def mascaras(self, imagen):
+        """
+        Clasifica la imagen una sola vez y devuelve un diccionario clase -> máscara 0/255.
+        """
+        clases = self.clasificar(imagen)
+        return {clase: ((clases >> bit) & 1) * np.uint8(255) for bit, clase in enumerate(self.clases)}
+
+def obtener_clasificador(reglas, directorio=DIRECTORIO_TABLAS):
+    """
+    Devuelve el clasificador de las reglas indicadas, reutilizando la tabla ya construida en
+    este proceso o guardada en disco; solo se construye la primera vez.
+    Con directorio=None no se usa el disco.
+    """
+    reglas = _normalizar_reglas(reglas)
+    clave = hashlib.sha256(json.dumps(list(reglas.items())).encode()).hexdigest()
+    if clave in _tablas_en_memoria:
+        return _tablas_en_memoria[clave]
+
+    ruta = os.path.join(directorio, f"{clave}.npz") if directorio else None
+    clasificador = None
+    if ruta and os.path.exists(ruta):
+        try:
+            clasificador = ClasificadorLUT.cargar(ruta)
+        except (ValueError, OSError, KeyError):
+            clasificador = None
+    if clasificador is None:
+        with etapa("construir_lut", TOTAL_COLORES):
+            clasificador = ClasificadorLUT.desde_reglas(reglas)
+        if ruta:
+            os.makedirs(directorio, exist_ok=True)
+            clasificador.guardar(ruta)
+    _tablas_en_memoria[clave] = clasificador
+    return clasificador
+
+def mascara_hsv(imagen, bajo, alto, usar_lut=False):
+    """
+    Máscara de un rango HSV: con cvtColor + inRange, o con la tabla precalculada si usar_lut.
+    """
+    pixeles = imagen.shape[0] * imagen.shape[1]
+    if usar_lut:
+        clasificador = obtener_clasificador({"rango": (bajo, alto)})
+        with etapa("clasificador_lut", pixeles):
+            return clasificador.mascara(imagen, "rango")
+    with etapa("bgr_a_hsv", pixeles):
+        hsv = cv2.cvtColor(imagen, cv2.COLOR_BGR2HSV)
+    with etapa("in_range", pixeles):
+        return cv2.inRange(hsv, np.array(bajo), np.array(alto))
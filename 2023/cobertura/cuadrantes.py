@@ -0,0 +1,58 @@
+import numpy as np
+
+from cobertura.cache import con_cache
+from cobertura.clasificador_lut import mascara_hsv
+from cobertura.instrumentacion import etapa
+from cobertura.vectorizado import tamano_cuadricula
+
+def limites_subceldas(tamano, subdivisiones):
+    """
+    Inicio de cada subdivisión dentro de una cuadrícula de tamano píxeles. Con 2 subdivisiones
+    el corte es tamano // 2, igual que los cuadrantes de Prueba4.py a prueba7.py.
+    """
+    return np.arange(subdivisiones) * tamano // subdivisiones
+
+def contar_por_subcelda(mascara, num_filas, num_columnas, subdivisiones=2):
+    """
+    Cuenta los píxeles distintos de cero de cada subcelda con dos reducciones sobre la máscara
+    completa. Devuelve los conteos con forma (filas, columnas, subdivisiones, subdivisiones)
+    y el número de píxeles de cada subcelda, con forma (subdivisiones, subdivisiones).
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(mascara, num_filas, num_columnas)
+    zona = (mascara[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula] != 0).view(np.uint8)
+    inicios_y = limites_subceldas(alto_cuadricula, subdivisiones)
+    inicios_x = limites_subceldas(ancho_cuadricula, subdivisiones)
+
+    # reduceat suma cada tramo entre un índice y el siguiente, así las subceldas pueden tener
+    # tamaños distintos cuando la cuadrícula no es divisible por el número de subdivisiones
+    filas = (np.arange(num_filas)[:, None] * alto_cuadricula + inicios_y).ravel()
+    columnas = (np.arange(num_columnas)[:, None] * ancho_cuadricula + inicios_x).ravel()
+    with etapa("contar_por_subcelda", zona.size):
+        conteos = np.add.reduceat(np.add.reduceat(zona, filas, axis=0, dtype=np.int32), columnas, axis=1)
+    conteos = conteos.reshape(num_filas, subdivisiones, num_columnas, subdivisiones).transpose(0, 2, 1, 3)
+
+    altos = np.diff(np.append(inicios_y, alto_cuadricula))
+    anchos = np.diff(np.append(inicios_x, ancho_cuadricula))
+    return conteos, np.outer(altos, anchos)
+
+@con_cache
+def analizar_cuadrantes(imagen, num_filas, num_columnas, verde_bajo=(30, 20, 20), verde_alto=(90, 255, 255),
+                        umbral_cuadrante=30, subdivisiones=2, estricto=False, usar_lut=False):
+    """
+    Método de los cuadrantes de Prueba4.py a prueba7.py para toda la imagen: cada cuadrícula se
+    divide en subdivisiones x subdivisiones partes y cada parte cuyo porcentaje de verde alcanza
+    umbral_cuadrante suma 100 / subdivisiones² puntos (25 con los 4 cuadrantes).
+    Con estricto=True el porcentaje debe superar el umbral (Prueba4.py y Prueba5.py usan ">").
+    Los valores por defecto son los de prueba7.py.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    mascara = mascara_hsv(zona, verde_bajo, verde_alto, usar_lut)
+    conteos, pixeles = contar_por_subcelda(mascara, num_filas, num_columnas, subdivisiones)
+
+    porcentajes = (conteos / pixeles) * 100
+    cubiertos = porcentajes > umbral_cuadrante if estricto else porcentajes >= umbral_cuadrante
+    cubiertos = np.count_nonzero(cubiertos, axis=(2, 3))
+    if 100 % subdivisiones ** 2 == 0:
+        return cubiertos * (100 // subdivisiones ** 2)
+    return cubiertos * (100 / subdivisiones ** 2)
@@ -0,0 +1,126 @@
+import json
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from cobertura.instrumentacion import etapa
+
+class EscritorDiagnostico:
+    """
+    Guarda las imágenes de diagnóstico en segundo plano: la codificación JPEG y la escritura
+    se hacen en un grupo de hilos alimentado por una cola acotada, de modo que el análisis
+    no espera al disco (y se frena si la cola se llena).
+    """
+
+    def __init__(self, directorio=".", hilos=2, max_pendientes=64,
+                 patron="diagnostico_cuadricula_{fila}_{columna}.jpg"):
+        self.directorio = directorio
+        self.patron = patron
+        self._cola = queue.Queue(max_pendientes)
+        self._error = None
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True) for _ in range(hilos)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def agregar(self, fila, columna, imagen):
+        """
+        Encola la imagen de diagnóstico de una cuadrícula. La imagen no debe modificarse después.
+        """
+        if self._error is not None:
+            raise self._error
+        ruta = os.path.join(self.directorio, self.patron.format(fila=fila, columna=columna))
+        self._cola.put((ruta, imagen))
+
+    def _trabajar(self):
+        while True:
+            tarea = self._cola.get()
+            if tarea is None:
+                return
+            ruta, imagen = tarea
+            try:
+                with etapa("diagnostico_imencode", imagen.shape[0] * imagen.shape[1]):
+                    correcto, datos = cv2.imencode(os.path.splitext(ruta)[1], imagen)
+                if not correcto:
+                    raise ValueError(f"No se pudo codificar {ruta}")
+                with etapa("diagnostico_escritura", bytes_escritos=datos.size):
+                    with open(ruta, "wb") as archivo:
+                        archivo.write(datos.tobytes())
+            except Exception as error:
+                self._error = error
+
+    def cerrar(self):
+        """
+        Espera a que se escriban todas las imágenes pendientes.
+        """
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+class AtlasDiagnostico:
+    """
+    Reúne las imágenes de diagnóstico de todas las cuadrículas en un único mosaico con la misma
+    disposición que la cuadrícula, más un índice JSON con la posición de cada celda.
+    """
+
+    def __init__(self, num_filas, num_columnas, archivo="diagnostico_atlas.jpg", escala=1.0):
+        self.num_filas = num_filas
+        self.num_columnas = num_columnas
+        self.archivo = archivo
+        self.escala = escala
+        self.atlas = None
+        self.celdas = []
+
+    def agregar(self, fila, columna, imagen):
+        """
+        Copia la imagen de diagnóstico de una cuadrícula en su posición del mosaico.
+        """
+        if self.escala != 1.0:
+            imagen = cv2.resize(imagen, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        if imagen.ndim == 2:
+            imagen = cv2.cvtColor(imagen, cv2.COLOR_GRAY2BGR)
+        alto, ancho = imagen.shape[:2]
+        if self.atlas is None:
+            self.alto_celda, self.ancho_celda = alto, ancho
+            self.atlas = np.zeros((self.num_filas * alto, self.num_columnas * ancho, 3), dtype=np.uint8)
+
+        y, x = fila * self.alto_celda, columna * self.ancho_celda
+        self.atlas[y:y + alto, x:x + ancho] = imagen[:self.alto_celda, :self.ancho_celda]
+        self.celdas.append({"fila": fila, "columna": columna, "x": x, "y": y, "ancho": ancho, "alto": alto})
+
+    def cerrar(self):
+        """
+        Dibuja la cuadrícula sobre el mosaico y guarda la imagen y su índice.
+        """
+        if self.atlas is None:
+            return
+        for fila in range(1, self.num_filas):
+            cv2.line(self.atlas, (0, fila * self.alto_celda), (self.atlas.shape[1], fila * self.alto_celda),
+                     (255, 255, 0), 1)
+        for columna in range(1, self.num_columnas):
+            cv2.line(self.atlas, (columna * self.ancho_celda, 0), (columna * self.ancho_celda, self.atlas.shape[0]),
+                     (255, 255, 0), 1)
+        with etapa("diagnostico_imwrite", self.atlas.shape[0] * self.atlas.shape[1]) as medicion:
+            cv2.imwrite(self.archivo, self.atlas)
+            if medicion:
+                medicion.agregar(bytes_escritos=os.path.getsize(self.archivo))
+        with open(os.path.splitext(self.archivo)[0] + ".json", "w", encoding="utf-8") as indice:
+            json.dump({"imagen": os.path.basename(self.archivo), "celdas": self.celdas}, indice, indent=1)
+        print(f"Atlas de diagnóstico guardado como {self.archivo}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
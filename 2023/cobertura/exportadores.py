@@ -0,0 +1,221 @@
+import abc
+import csv
+import os
+import re
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from cobertura.instrumentacion import etapa
+
+# Caracteres que Excel no admite en el nombre de una hoja
+_CARACTERES_HOJA = re.compile(r"[\[\]:*?/\\]")
+
+class Exportador(abc.ABC):
+    """
+    Base de los exportadores por filas: reciben cada fila de resultados en cuanto se termina
+    de calcular, sin construir la matriz completa ni un DataFrame.
+    """
+
+    @abc.abstractmethod
+    def agregar_fila(self, imagen, tipo, fila, valores):
+        """
+        Agrega la fila fila (un arreglo de valores por columna) de la matriz tipo de la imagen.
+        """
+
+    def agregar_matrices(self, imagen, resultados, fila_inicio=0):
+        """
+        Agrega todas las filas de un diccionario tipo -> matriz (o de una parte de él).
+        """
+        with etapa("exportar_filas"):
+            for tipo, matriz in resultados.items():
+                for desplazamiento, valores in enumerate(np.asarray(matriz)):
+                    self.agregar_fila(imagen, tipo, fila_inicio + desplazamiento, valores)
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.cerrar()
+
+class ExportadorCSV(Exportador):
+    """
+    Escribe una fila por cuadrícula (imagen, tipo, fila, columna, valor). Con anadir=True, si
+    el archivo ya existe se agregan las filas al final; si no, se reemplaza.
+    """
+
+    def __init__(self, ruta, anadir=False):
+        nuevo = not anadir or not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+        self._archivo = open(ruta, "w" if nuevo else "a", newline="", encoding="utf-8")
+        self._escritor = csv.writer(self._archivo)
+        if nuevo:
+            self._escritor.writerow(["imagen", "tipo", "fila", "columna", "valor"])
+
+    def agregar_fila(self, imagen, tipo, fila, valores):
+        self._escritor.writerows([imagen, tipo, fila, columna, int(valor)] for columna, valor in enumerate(valores))
+
+    def cerrar(self):
+        self._archivo.close()
+
+class ExportadorNPZ(Exportador):
+    """
+    Agrega cada fila como un arreglo "<imagen>::<tipo>::<fila>" dentro de un .npz. Con
+    anadir=True las imágenes que ya estaban en el archivo se conservan, salvo las que se
+    vuelven a exportar, que se reemplazan; si no, el archivo se reemplaza. Las matrices se
+    reconstruyen con cargar_npz.
+    """
+
+    def __init__(self, ruta, anadir=False):
+        self._ruta = ruta
+        self._temporal = None
+        if anadir and os.path.exists(ruta) and os.path.getsize(ruta) > 0:
+            # Un zip no permite borrar miembros: las filas nuevas se escriben en un zip
+            # temporal y al cerrar se combinan con las anteriores en una sola pasada
+            descriptor, self._temporal = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta)),
+                                                          suffix=".tmp")
+            os.close(descriptor)
+            with zipfile.ZipFile(ruta) as anterior:
+                self._anteriores = {nombre.rsplit("::", 2)[0] for nombre in anterior.namelist()}
+        self._zip = zipfile.ZipFile(self._temporal or ruta, "w", compression=zipfile.ZIP_DEFLATED)
+        self._exportadas = set()
+
+    def agregar_fila(self, imagen, tipo, fila, valores):
+        self._exportadas.add(imagen)
+        with self._zip.open(f"{imagen}::{tipo}::{fila}.npy", "w", force_zip64=True) as destino:
+            np.lib.format.write_array(destino, np.asarray(valores))
+
+    def cerrar(self):
+        self._zip.close()
+        if self._temporal is None:
+            return
+        if self._anteriores.isdisjoint(self._exportadas):
+            # Nada que reemplazar: las filas nuevas se agregan al final del archivo existente
+            with zipfile.ZipFile(self._temporal) as origen, \
+                    zipfile.ZipFile(self._ruta, "a", compression=zipfile.ZIP_DEFLATED) as destino:
+                for miembro in origen.infolist():
+                    destino.writestr(miembro, origen.read(miembro))
+            os.remove(self._temporal)
+        else:
+            # Se copian al zip nuevo las imágenes anteriores que no se reemplazaron
+            with zipfile.ZipFile(self._ruta) as origen, \
+                    zipfile.ZipFile(self._temporal, "a", compression=zipfile.ZIP_DEFLATED) as destino:
+                for miembro in origen.infolist():
+                    if miembro.filename.rsplit("::", 2)[0] not in self._exportadas:
+                        destino.writestr(miembro, origen.read(miembro))
+            os.replace(self._temporal, self._ruta)
+        self._temporal = None
+
+class ExportadorParquet(Exportador):
+    """
+    Escribe las filas en formato largo (imagen, tipo, fila, columna, valor) a un conjunto de
+    datos Parquet: cada ejecución agrega un archivo nuevo al directorio indicado.
+    Requiere el paquete opcional pyarrow.
+    """
+
+    def __init__(self, directorio, filas_por_grupo=65536):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        os.makedirs(directorio, exist_ok=True)
+        self._esquema = pa.schema([("imagen", pa.string()), ("tipo", pa.string()), ("fila", pa.int32()),
+                                   ("columna", pa.int32()), ("valor", pa.int32())])
+        ruta = os.path.join(directorio, f"parte-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.parquet")
+        self._escritor = pq.ParquetWriter(ruta, self._esquema)
+        self._filas_por_grupo = filas_por_grupo
+        self._pendientes = []
+
+    def agregar_fila(self, imagen, tipo, fila, valores):
+        self._pendientes.append((imagen, tipo, fila, np.asarray(valores)))
+        if sum(len(p[3]) for p in self._pendientes) >= self._filas_por_grupo:
+            self._volcar()
+
+    def _volcar(self):
+        if not self._pendientes:
+            return
+        tamanos = [len(valores) for *_, valores in self._pendientes]
+        columnas = {
+            "imagen": np.repeat([p[0] for p in self._pendientes], tamanos),
+            "tipo": np.repeat([p[1] for p in self._pendientes], tamanos),
+            "fila": np.repeat([p[2] for p in self._pendientes], tamanos).astype(np.int32),
+            "columna": np.concatenate([np.arange(n, dtype=np.int32) for n in tamanos]),
+            "valor": np.concatenate([valores for *_, valores in self._pendientes]).astype(np.int32),
+        }
+        self._escritor.write_table(self._pa.table(columnas, schema=self._esquema))
+        self._pendientes = []
+
+    def cerrar(self):
+        self._volcar()
+        self._escritor.close()
+
+class ExportadorExcel(Exportador):
+    """
+    Escribe un .xlsx con xlsxwriter en modo de memoria constante: una hoja por tipo (y por
+    imagen si hay varias), con el mismo formato que exportar_a_excel_resultados.
+    Requiere el paquete opcional xlsxwriter.
+    """
+
+    def __init__(self, ruta):
+        import xlsxwriter
+
+        self._libro = xlsxwriter.Workbook(ruta, {"constant_memory": True})
+        self._hojas = {}
+
+    def _hoja(self, imagen, tipo, columnas):
+        clave = (imagen, tipo)
+        if clave not in self._hojas:
+            nombre = tipo.capitalize()
+            if self._hojas and imagen != next(iter(self._hojas))[0]:
+                nombre = f"{os.path.splitext(os.path.basename(imagen))[0]} {nombre}"
+            # Excel no admite []:*?/\ ni apóstrofes en los extremos, limita el nombre a 31
+            # caracteres y no distingue mayúsculas de minúsculas al compararlos
+            base = _CARACTERES_HOJA.sub("_", nombre).strip("'")[:31] or "Hoja"
+            usados = {hoja.name.lower() for hoja in self._hojas.values()}
+            nombre, contador = base, 1
+            while nombre.lower() in usados:
+                sufijo = f"_{contador}"
+                nombre = f"{base[:31 - len(sufijo)]}{sufijo}"
+                contador += 1
+            hoja = self._libro.add_worksheet(nombre)
+            hoja.write_row(0, 0, ["Fila"] + [f"Columna {i + 1}" for i in range(columnas)])
+            self._hojas[clave] = hoja
+        return self._hojas[clave]
+
+    def agregar_fila(self, imagen, tipo, fila, valores):
+        hoja = self._hoja(imagen, tipo, len(valores))
+        hoja.write_row(fila + 1, 0, [fila] + [int(valor) for valor in valores])
+
+    def cerrar(self):
+        self._libro.close()
+
+def crear_exportador(ruta, anadir=False):
+    """
+    Elige el exportador según la extensión: .csv, .npz, .xlsx o .parquet (o un directorio).
+    Con anadir=True los .csv y .npz existentes se amplían en lugar de reemplazarse.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        return ExportadorCSV(ruta, anadir)
+    if extension == ".npz":
+        return ExportadorNPZ(ruta, anadir)
+    if extension == ".xlsx":
+        return ExportadorExcel(ruta)
+    if extension in (".parquet", "") or os.path.isdir(ruta):
+        return ExportadorParquet(ruta)
+    raise ValueError(f"Formato de salida no soportado: {ruta}")
+
+def cargar_npz(ruta):
+    """
+    Reconstruye las matrices de un .npz escrito por ExportadorNPZ: (imagen, tipo) -> matriz.
+    """
+    filas = {}
+    with np.load(ruta) as datos:
+        for clave in datos.files:
+            imagen, tipo, fila = clave.rsplit("::", 2)
+            filas.setdefault((imagen, tipo), {})[int(fila)] = datos[clave]
+    return {clave: np.vstack([por_fila[f] for f in sorted(por_fila)]) for clave, por_fila in filas.items()}
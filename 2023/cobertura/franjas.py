@@ -0,0 +1,153 @@
+import inspect
+import os
+
+import cv2
+import numpy as np
+
+class LectorNpy:
+    """
+    Lee franjas de una imagen BGR guardada como .npy, mapeada en memoria.
+    Solo se cargan en memoria las páginas de la franja pedida.
+    """
+
+    def __init__(self, ruta):
+        self._imagen = np.load(ruta, mmap_mode="r")
+        self.alto, self.ancho = self._imagen.shape[:2]
+
+    def leer(self, y_inicio, y_fin):
+        return np.ascontiguousarray(self._imagen[y_inicio:y_fin])
+
+    def cerrar(self):
+        self._imagen = None
+
+class LectorGDAL:
+    """
+    Lee franjas de un ortomosaico (GeoTIFF u otro formato soportado por GDAL)
+    sin decodificar el resto de la imagen. Requiere el paquete opcional osgeo.
+    Admite 1 banda (gris), 2 (gris y alfa), 3 (RGB) o 4 (RGBA), de 8 bits o de más bits
+    enteros sin signo; estas se reescalan a 8 bits según su profundidad (NBITS o la del tipo).
+    El alfa se descarta.
+    """
+
+    def __init__(self, ruta):
+        from osgeo import gdal
+
+        self._ds = gdal.Open(ruta)
+        if self._ds is None:
+            raise FileNotFoundError(f"No se pudo cargar la imagen: {ruta}")
+        self.alto = self._ds.RasterYSize
+        self.ancho = self._ds.RasterXSize
+        if self._ds.RasterCount not in (1, 2, 3, 4):
+            raise ValueError(f"Número de bandas no soportado ({self._ds.RasterCount}): {ruta}")
+        tipo = np.dtype(gdal.GetDataTypeName(self._ds.GetRasterBand(1).DataType).lower())
+        if tipo.kind != "u":
+            raise ValueError(f"Tipo de datos no soportado ({tipo}): {ruta}")
+        bits = self._ds.GetRasterBand(1).GetMetadataItem("NBITS", "IMAGE_STRUCTURE")
+        self._maximo = 2 ** int(bits) - 1 if bits else np.iinfo(tipo).max
+
+    def _a_uint8(self, bandas):
+        if self._maximo == 255:
+            return bandas.astype(np.uint8, copy=False)
+        escaladas = bandas.astype(np.float32) * (255 / self._maximo)
+        return np.clip(np.rint(escaladas), 0, 255).astype(np.uint8)
+
+    def leer(self, y_inicio, y_fin):
+        bandas = self._ds.ReadAsArray(0, y_inicio, self.ancho, y_fin - y_inicio)
+        if bandas.ndim == 2:
+            bandas = bandas[np.newaxis]
+        if bandas.shape[0] <= 2:
+            # Gris, con o sin alfa
+            return cv2.cvtColor(self._a_uint8(bandas[0]), cv2.COLOR_GRAY2BGR)
+        # GDAL entrega las bandas en orden RGB(A); los análisis esperan BGR
+        return np.ascontiguousarray(np.moveaxis(self._a_uint8(bandas[2::-1]), 0, -1))
+
+    def cerrar(self):
+        self._ds = None
+
+class LectorOpenCV:
+    """
+    Alternativa para JPEG/PNG: OpenCV no permite decodificar por partes, así que la imagen
+    se decodifica completa una vez y solo se ahorra la copia para superponer resultados.
+    """
+
+    def __init__(self, ruta):
+        self._imagen = cv2.imread(ruta)
+        if self._imagen is None:
+            raise FileNotFoundError(f"No se pudo cargar la imagen: {ruta}")
+        self.alto, self.ancho = self._imagen.shape[:2]
+
+    def leer(self, y_inicio, y_fin):
+        return self._imagen[y_inicio:y_fin]
+
+    def cerrar(self):
+        self._imagen = None
+
+def abrir_lector(ruta):
+    """
+    Elige el lector de franjas adecuado para la ruta: .npy mapeado en memoria,
+    GDAL si está instalado, y OpenCV en último caso.
+    """
+    if os.path.splitext(ruta)[1].lower() == ".npy":
+        return LectorNpy(ruta)
+    try:
+        return LectorGDAL(ruta)
+    except ImportError:
+        return LectorOpenCV(ruta)
+
+def analizar_por_franjas(lector, num_filas, num_columnas, analizador, filas_por_franja=1):
+    """
+    Lee la imagen en franjas horizontales alineadas con las filas de la cuadrícula y
+    produce (fila_inicio, resultados) a medida que se analiza cada franja.
+
+    analizador recibe (franja, filas_de_la_franja, num_columnas), igual que
+    analizar_cuadriculas, Plan(...).ejecutar o analizar_cuadriculas_vial y
+    analizar_cuadriculas_vial_gris. Como la franja ocupa todo el ancho y un número entero de
+    filas, las cuadrículas son las mismas que al analizar la imagen completa. Si el analizador
+    acepta fila_inicio (como los viales), se le pasa la primera fila de la franja, de modo que
+    los diagnósticos y las líneas dibujadas usan la numeración y las coordenadas de la imagen
+    completa.
+
+    Los análisis globales (analizar_cuadriculas_vial_global y _gris_global) no pueden hacerse
+    por franjas: detectan las líneas en toda la imagen y las que cruzan el borde de una franja
+    quedarían cortadas. Se rechazan con ValueError.
+    """
+    nombre = getattr(getattr(analizador, "func", analizador), "__name__", "")
+    if nombre.endswith("_global"):
+        raise ValueError(f"{nombre} detecta líneas en toda la imagen y no puede analizarse por franjas")
+    try:
+        acepta_fila = "fila_inicio" in inspect.signature(analizador).parameters
+    except (TypeError, ValueError):
+        acepta_fila = False
+    alto_cuadricula = lector.alto // num_filas
+    for fila in range(0, num_filas, filas_por_franja):
+        filas = min(filas_por_franja, num_filas - fila)
+        franja = lector.leer(fila * alto_cuadricula, (fila + filas) * alto_cuadricula)
+        if acepta_fila:
+            resultados = analizador(franja, filas, num_columnas, fila_inicio=fila)
+        else:
+            resultados = analizador(franja, filas, num_columnas)
+        del franja
+        yield fila, resultados
+
+def analizar_archivo_por_franjas(ruta, num_filas, num_columnas, analizador, filas_por_franja=1, exportador=None,
+                                 tipo="vial"):
+    """
+    Analiza un archivo por franjas y une los resultados en las matrices completas.
+    Devuelve una matriz o un diccionario tipo -> matriz, según lo que devuelva el analizador.
+    Si se pasa un exportador, cada fila se exporta en cuanto termina su franja; tipo es el
+    nombre usado cuando el analizador devuelve una sola matriz.
+    """
+    lector = abrir_lector(ruta)
+    partes = []
+    try:
+        for fila, resultados in analizar_por_franjas(lector, num_filas, num_columnas, analizador, filas_por_franja):
+            if exportador is not None:
+                exportador.agregar_matrices(ruta, resultados if isinstance(resultados, dict) else {tipo: resultados},
+                                            fila)
+            partes.append(resultados)
+    finally:
+        lector.cerrar()
+
+    if partes and isinstance(partes[0], dict):
+        return {clave: np.vstack([parte[clave] for parte in partes]) for clave in partes[0]}
+    return np.vstack(partes)
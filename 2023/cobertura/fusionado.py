@@ -0,0 +1,175 @@
+import cv2
+import numpy as np
+
+from cobertura.instrumentacion import etapa
+from cobertura.vectorizado import contar_por_celda, tamano_cuadricula
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_DISPONIBLE = numba is not None
+
+# Análisis píxel a píxel que puede resolver el núcleo
+TIPOS_FUSIONABLES = ("vegetal", "urbanistico")
+
+# Aritmética entera de cv2.cvtColor(BGR2HSV) para imágenes de 8 bits: divisiones con tablas
+# en coma fija de 12 bits, así el resultado coincide exactamente con cvtColor + inRange
+_DESPLAZAMIENTO_HSV = 12
+_MEDIO_HSV = 1 << (_DESPLAZAMIENTO_HSV - 1)
+_divisores = np.arange(256, dtype=np.float64)
+with np.errstate(divide="ignore"):
+    _TABLA_S = np.where(_divisores > 0, np.rint((255 << _DESPLAZAMIENTO_HSV) / _divisores), 0).astype(np.int32)
+    _TABLA_H = np.where(_divisores > 0, np.rint((180 << _DESPLAZAMIENTO_HSV) / (6 * _divisores)), 0).astype(np.int32)
+
+# Coeficientes de cv2.cvtColor(BGR2GRAY) para 8 bits en coma fija de 15 bits
+_GRIS_B, _GRIS_G, _GRIS_R, _DESPLAZAMIENTO_GRIS = 3735, 19235, 9798, 15
+_MEDIO_GRIS = 1 << (_DESPLAZAMIENTO_GRIS - 1)
+
+_prange = numba.prange if NUMBA_DISPONIBLE else range
+
+def _contar_clases(bgr, alto_cuadricula, ancho_cuadricula, num_filas, num_columnas, bajos, altos, umbrales_gris,
+                   tabla_s, tabla_h, conteos):
+    # Un solo recorrido de los píxeles BGR: cada tramo de una fila de píxeles dentro de una
+    # celda se convierte a HSV y gris en búferes del ancho de la celda, y cada regla se cuenta
+    # sobre ese tramo sin saltos condicionales. Cada hilo recorre filas de cuadrículas
+    # completas, así nunca escriben dos hilos en el mismo contador.
+    num_rangos = bajos.shape[0]
+    num_grises = umbrales_gris.shape[0]
+    for fila in _prange(num_filas):
+        tono = np.empty(ancho_cuadricula, np.int32)
+        saturacion = np.empty(ancho_cuadricula, np.int32)
+        valor = np.empty(ancho_cuadricula, np.int32)
+        gris = np.empty(ancho_cuadricula, np.int32)
+        for y in range(fila * alto_cuadricula, (fila + 1) * alto_cuadricula):
+            for columna in range(num_columnas):
+                x_inicio = columna * ancho_cuadricula
+                if num_rangos:
+                    for i in range(ancho_cuadricula):
+                        b = np.int32(bgr[y, x_inicio + i, 0])
+                        g = np.int32(bgr[y, x_inicio + i, 1])
+                        r = np.int32(bgr[y, x_inicio + i, 2])
+                        v = max(b, g, r)
+                        diferencia = v - min(b, g, r)
+                        if v == r:
+                            h = g - b
+                        elif v == g:
+                            h = b - r + 2 * diferencia
+                        else:
+                            h = r - g + 4 * diferencia
+                        h = (h * tabla_h[diferencia] + _MEDIO_HSV) >> _DESPLAZAMIENTO_HSV
+                        tono[i] = h + 180 if h < 0 else h
+                        saturacion[i] = (diferencia * tabla_s[v] + _MEDIO_HSV) >> _DESPLAZAMIENTO_HSV
+                        valor[i] = v
+                for k in range(num_rangos):
+                    h_bajo, s_bajo, v_bajo = bajos[k, 0], bajos[k, 1], bajos[k, 2]
+                    h_alto, s_alto, v_alto = altos[k, 0], altos[k, 1], altos[k, 2]
+                    total = 0
+                    for i in range(ancho_cuadricula):
+                        total += ((h_bajo <= tono[i]) & (tono[i] <= h_alto) & (s_bajo <= saturacion[i])
+                                  & (saturacion[i] <= s_alto) & (v_bajo <= valor[i]) & (valor[i] <= v_alto))
+                    conteos[fila, columna, k] += total
+                if num_grises:
+                    for i in range(ancho_cuadricula):
+                        b = np.int32(bgr[y, x_inicio + i, 0])
+                        g = np.int32(bgr[y, x_inicio + i, 1])
+                        r = np.int32(bgr[y, x_inicio + i, 2])
+                        gris[i] = (b * _GRIS_B + g * _GRIS_G + r * _GRIS_R + _MEDIO_GRIS) >> _DESPLAZAMIENTO_GRIS
+                for k in range(num_grises):
+                    umbral = umbrales_gris[k]
+                    total = 0
+                    for i in range(ancho_cuadricula):
+                        total += gris[i] > umbral
+                    conteos[fila, columna, num_rangos + k] += total
+
+if NUMBA_DISPONIBLE:
+    # La primera llamada compila el núcleo; cache=True guarda la compilación entre ejecuciones
+    _contar_clases = numba.njit(parallel=True, cache=True, nogil=True)(_contar_clases)
+
+def _contar_con_opencv(zona, num_filas, num_columnas, rangos_hsv, umbrales_gris):
+    # Alternativa sin numba: la cadena habitual cvtColor -> inRange/threshold -> conteo
+    conteos = []
+    if rangos_hsv:
+        with etapa("bgr_a_hsv", zona.shape[0] * zona.shape[1]):
+            hsv = cv2.cvtColor(zona, cv2.COLOR_BGR2HSV)
+        for bajo, alto in rangos_hsv:
+            conteos.append(contar_por_celda(cv2.inRange(hsv, np.array(bajo), np.array(alto)), num_filas, num_columnas))
+    if umbrales_gris:
+        with etapa("bgr_a_gris", zona.shape[0] * zona.shape[1]):
+            gris = cv2.cvtColor(zona, cv2.COLOR_BGR2GRAY)
+        for umbral in umbrales_gris:
+            mascara = cv2.threshold(gris, umbral, 255, cv2.THRESH_BINARY)[1]
+            conteos.append(contar_por_celda(mascara, num_filas, num_columnas))
+    return np.stack(conteos, axis=-1)
+
+def contar_clases(imagen, num_filas, num_columnas, rangos_hsv=(), umbrales_gris=(), usar_numba=True):
+    """
+    Cuenta por cuadrícula los píxeles de cada regla sin crear la imagen HSV, la gris ni las
+    máscaras: rangos_hsv son pares (bajo, alto) como en cv2.inRange y umbrales_gris valores
+    como en cv2.threshold. Devuelve una matriz (filas, columnas, reglas) con las reglas HSV
+    primero y las de gris después. Sin numba (o con usar_numba=False) se usa OpenCV.
+    """
+    if not rangos_hsv and not umbrales_gris:
+        raise ValueError("Se necesita al menos un rango HSV o un umbral de gris.")
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    if not (usar_numba and NUMBA_DISPONIBLE):
+        return _contar_con_opencv(zona, num_filas, num_columnas, rangos_hsv, umbrales_gris)
+
+    rangos = np.asarray(rangos_hsv, dtype=np.int32).reshape(-1, 2, 3)
+    # cv2.threshold redondea hacia abajo el umbral en imágenes de 8 bits
+    umbrales = np.floor(np.asarray(umbrales_gris, dtype=np.float64)).astype(np.int32)
+    conteos = np.zeros((num_filas, num_columnas, len(rangos) + len(umbrales)), dtype=np.int64)
+    with etapa("nucleo_fusionado", zona.shape[0] * zona.shape[1]):
+        _contar_clases(zona, alto_cuadricula, ancho_cuadricula, num_filas, num_columnas,
+                       np.ascontiguousarray(rangos[:, 0]), np.ascontiguousarray(rangos[:, 1]), umbrales,
+                       _TABLA_S, _TABLA_H, conteos)
+    return conteos
+
+def contar_tipos(imagen, num_filas, num_columnas, tipos_parametros, usar_numba=True):
+    """
+    Conteos por cuadrícula de varios análisis píxel a píxel en un solo recorrido.
+    tipos_parametros es una lista de (tipo, parámetros completos); devuelve tipo -> matriz.
+    """
+    rangos = [(p["verde_bajo"], p["verde_alto"]) for tipo, p in tipos_parametros if tipo == "vegetal"]
+    umbrales = [p["umbral_gris"] for tipo, p in tipos_parametros if tipo == "urbanistico"]
+    conteos = contar_clases(imagen, num_filas, num_columnas, rangos, umbrales, usar_numba)
+
+    resultados = {}
+    siguiente_rango, siguiente_gris = 0, len(rangos)
+    for tipo, _ in tipos_parametros:
+        if tipo == "vegetal":
+            resultados[tipo], siguiente_rango = conteos[..., siguiente_rango], siguiente_rango + 1
+        else:
+            resultados[tipo], siguiente_gris = conteos[..., siguiente_gris], siguiente_gris + 1
+    return resultados
+
+# Reglas con las que se compara el núcleo con OpenCV: bordes del tono (0 y 179), saturación
+# y valor mínimos, el rango vegetal por defecto y umbrales de gris en los extremos
+RANGOS_VERIFICACION = (((0, 0, 0), (0, 255, 255)), ((179, 0, 0), (180, 255, 255)), ((0, 1, 1), (180, 1, 255)),
+                       ((30, 20, 10), (90, 255, 255)), ((10, 40, 40), (25, 255, 255)))
+UMBRALES_VERIFICACION = (0, 100, 127.5, 254)
+
+def verificar_nucleo(filas_por_bloque=256):
+    """
+    Compara el núcleo numba con cvtColor + inRange/threshold para los 16.7 millones de colores
+    BGR, píxel a píxel (cuadrículas de 1x1), con RANGOS_VERIFICACION y UMBRALES_VERIFICACION.
+    Devuelve el número de píxeles y reglas en que difieren (0 si coinciden), o None si numba no
+    está instalado. Detecta cambios en la aritmética de OpenCV que el núcleo ya no reproduzca.
+    """
+    if not NUMBA_DISPONIBLE:
+        return None
+    # Imagen de 4096x4096 en la que cada píxel es un color distinto
+    colores = np.arange(1 << 24, dtype=np.uint32)
+    imagen = np.stack([colores & 0xFF, (colores >> 8) & 0xFF, colores >> 16], axis=-1).astype(np.uint8)
+    imagen = imagen.reshape(4096, 4096, 3)
+    diferencias = 0
+    for inicio in range(0, imagen.shape[0], filas_por_bloque):
+        bloque = imagen[inicio:inicio + filas_por_bloque]
+        nucleo = contar_clases(bloque, bloque.shape[0], bloque.shape[1], RANGOS_VERIFICACION,
+                               UMBRALES_VERIFICACION, usar_numba=True)
+        referencia = _contar_con_opencv(bloque, bloque.shape[0], bloque.shape[1], RANGOS_VERIFICACION,
+                                        UMBRALES_VERIFICACION)
+        diferencias += int(np.count_nonzero(nucleo != referencia))
+    return diferencias
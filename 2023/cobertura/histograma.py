@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+from cobertura.vectorizado import cuantizar_cobertura, tamano_cuadricula
+
+# Rango de cada canal HSV en OpenCV (H va de 0 a 179)
+RANGOS_HSV = (180, 256, 256)
+
+class IndiceHistograma:
+    """
+    Histograma HSV 3D cuantizado de cada cuadrícula, guardado como sumas acumuladas.
+    Permite evaluar cualquier rango HSV (una caja bajo-alto) y cualquier umbral para toda la
+    cuadrícula sin volver a leer los píxeles.
+
+    El resultado es exacto cuando los límites caen en bordes de bin (ver es_exacto); si no,
+    el rango se amplía a los bins que contienen los límites.
+    """
+
+    def __init__(self, acumulado, bins, pixeles_por_celda):
+        # acumulado[fila, columna, h, s, v] = píxeles de la cuadrícula con bins < (h, s, v)
+        self.acumulado = acumulado
+        self.bins = tuple(bins)
+        self.pixeles_por_celda = pixeles_por_celda
+
+    @classmethod
+    def desde_imagen(cls, imagen, num_filas, num_columnas, bins=(36, 32, 32)):
+        """
+        Construye el índice recorriendo la imagen una sola vez, fila de cuadrículas por fila.
+        """
+        alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+        bh, bs, bv = bins
+        total_bins = bh * bs * bv
+        columna_de_x = np.arange(num_columnas * ancho_cuadricula) // ancho_cuadricula
+
+        conteos = np.empty((num_filas * num_columnas, total_bins), dtype=np.int32)
+        for fila in range(num_filas):
+            y = fila * alto_cuadricula
+            franja = imagen[y:y + alto_cuadricula, :num_columnas * ancho_cuadricula]
+            hsv = cv2.cvtColor(franja, cv2.COLOR_BGR2HSV).astype(np.int64)
+            bin_pixel = ((hsv[..., 0] * bh // RANGOS_HSV[0]) * bs + hsv[..., 1] * bs // RANGOS_HSV[1]) * bv \
+                + hsv[..., 2] * bv // RANGOS_HSV[2]
+            indice = columna_de_x[None, :] * total_bins + bin_pixel
+            conteos[fila * num_columnas:(fila + 1) * num_columnas] = np.bincount(
+                indice.ravel(), minlength=num_columnas * total_bins
+            ).reshape(num_columnas, total_bins)
+
+        acumulado = np.zeros((num_filas * num_columnas, bh + 1, bs + 1, bv + 1), dtype=np.int32)
+        acumulado[:, 1:, 1:, 1:] = conteos.reshape(-1, bh, bs, bv)
+        for eje in (1, 2, 3):
+            np.cumsum(acumulado, axis=eje, out=acumulado)
+        return cls(acumulado.reshape(num_filas, num_columnas, bh + 1, bs + 1, bv + 1), bins,
+                   alto_cuadricula * ancho_cuadricula)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta) as datos:
+            return cls(datos["acumulado"], datos["bins"], int(datos["pixeles_por_celda"]))
+
+    def guardar(self, ruta):
+        np.savez(ruta, acumulado=self.acumulado, bins=np.array(self.bins),
+                 pixeles_por_celda=self.pixeles_por_celda)
+
+    def _limites(self, bajo, alto):
+        bajo = np.asarray(bajo, dtype=np.int64)
+        alto = np.asarray(alto, dtype=np.int64)
+        bins = np.array(self.bins)
+        rangos = np.array(RANGOS_HSV)
+        inicio = np.clip(bajo * bins // rangos, 0, bins)
+        fin = np.clip(alto * bins // rangos + 1, 0, bins)
+        return inicio, np.maximum(fin, inicio)
+
+    def es_exacto(self, bajo, alto):
+        """
+        Indica si el rango coincide con bordes de bin, es decir, si contar() es exacto.
+        """
+        bins = np.array(self.bins)
+        rangos = np.array(RANGOS_HSV)
+        bajo, alto = np.asarray(bajo), np.asarray(alto)
+        # bajo debe ser el primer valor de su bin y alto el último del suyo
+        inicio_de_bin = (bajo <= 0) | ((bajo - 1) * bins // rangos != bajo * bins // rangos)
+        fin_de_bin = (alto >= rangos - 1) | ((alto + 1) * bins // rangos != alto * bins // rangos)
+        return bool(np.all(inicio_de_bin) and np.all(fin_de_bin))
+
+    def contar(self, bajo, alto):
+        """
+        Píxeles de cada cuadrícula dentro del rango HSV. bajo y alto pueden ser (3,) o (K, 3)
+        para evaluar K rangos a la vez; el resultado tiene forma (filas, columnas) o (K, filas, columnas).
+        """
+        inicio, fin = self._limites(bajo, alto)
+        h0, s0, v0 = np.moveaxis(inicio, -1, 0)
+        h1, s1, v1 = np.moveaxis(fin, -1, 0)
+        a = self.acumulado
+        total = (a[..., h1, s1, v1] - a[..., h0, s1, v1] - a[..., h1, s0, v1] - a[..., h1, s1, v0]
+                 + a[..., h0, s0, v1] + a[..., h0, s1, v0] + a[..., h1, s0, v0] - a[..., h0, s0, v0])
+        return np.moveaxis(total, -1, 0) if total.ndim == 3 else total
+
+    def cobertura(self, bajo, alto, umbral_porcentaje):
+        """
+        Matriz 0/25/50/75/100 para un rango HSV y un umbral, como analizar_cuadriculas.
+        """
+        return cuantizar_cobertura(self.contar(bajo, alto), self.pixeles_por_celda, umbral_porcentaje)
+
+    def barrido(self, bajos, altos, umbrales):
+        """
+        Evalúa K rangos HSV y U umbrales de una vez. Devuelve un arreglo (K, U, filas, columnas).
+        """
+        conteos = self.contar(np.atleast_2d(bajos), np.atleast_2d(altos))
+        return np.stack([cuantizar_cobertura(conteos, self.pixeles_por_celda, umbral) for umbral in umbrales], axis=1)
@@ -0,0 +1,142 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+from cobertura.cache import CacheResultados
+from cobertura.instrumentacion import etapa
+from cobertura.vectorizado import tamano_cuadricula
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DIRECTORIO_EPOCAS = os.path.join(os.path.expanduser("~"), ".cache", "cobertura", "epocas")
+
+# Las huellas de un algoritmo no se comparan con las de otro: forma parte de la clave del historial
+ALGORITMO_HUELLA = "xxh3_64" if xxhash is not None else "blake2b_64"
+
+# Lado en píxeles de la miniatura de cada cuadrícula usada para comparar con tolerancia
+LADO_MINIATURA = 8
+
+def _hash_64(datos):
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(datos)
+    return int.from_bytes(hashlib.blake2b(datos, digest_size=8).digest(), "little")
+
+def huellas_celdas(imagen, num_filas, num_columnas):
+    """
+    Hash de 64 bits de los píxeles de cada cuadrícula (xxhash si está instalado, si no blake2b).
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    huellas = np.empty((num_filas, num_columnas), dtype=np.uint64)
+    with etapa("huellas_celdas", num_filas * alto_cuadricula * num_columnas * ancho_cuadricula):
+        for fila in range(num_filas):
+            for columna in range(num_columnas):
+                y_inicio = fila * alto_cuadricula
+                x_inicio = columna * ancho_cuadricula
+                cuadricula = imagen[y_inicio:y_inicio + alto_cuadricula, x_inicio:x_inicio + ancho_cuadricula]
+                huellas[fila, columna] = _hash_64(np.ascontiguousarray(cuadricula).data)
+    return huellas
+
+def miniaturas_celdas(imagen, num_filas, num_columnas, lado=LADO_MINIATURA):
+    """
+    Reduce cada cuadrícula a lado x lado píxeles (promedio por áreas). Devuelve una matriz
+    (filas, columnas, lado, lado, canales) para comparar cuadrículas con tolerancia.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    with etapa("miniaturas_celdas", zona.shape[0] * zona.shape[1]):
+        reducida = cv2.resize(zona, (num_columnas * lado, num_filas * lado), interpolation=cv2.INTER_AREA)
+    return reducida.reshape(num_filas, lado, num_columnas, lado, -1).transpose(0, 2, 1, 3, 4)
+
+def celdas_cambiadas(anterior, huellas, miniaturas, tolerancia=0):
+    """
+    Matriz booleana de las cuadrículas que cambiaron respecto del estado anterior. Con
+    tolerancia=0 cuenta cualquier cambio de píxeles; con tolerancia > 0 solo las cuadrículas
+    cuya miniatura difiere en promedio más de ese valor (niveles de 0 a 255), lo que ignora
+    el ruido entre vuelos de una zona que no cambió.
+    """
+    if anterior is None or anterior["huellas"].shape != huellas.shape:
+        return np.ones(huellas.shape, dtype=bool)
+    if not tolerancia:
+        return anterior["huellas"] != huellas
+    diferencia = np.abs(anterior["miniaturas"].astype(np.int16) - miniaturas.astype(np.int16))
+    return diferencia.mean(axis=(2, 3, 4)) > tolerancia
+
+def _como_diccionario(resultado):
+    return resultado if isinstance(resultado, dict) else {"__matriz__": resultado}
+
+def analizar_incremental(imagen, num_filas, num_columnas, analizador, anterior=None, tolerancia=0,
+                         fraccion_completa=0.5):
+    """
+    Analiza solo las cuadrículas que cambiaron desde el estado anterior y reutiliza el resto.
+    analizador(imagen, num_filas, num_columnas) debe calcular cada cuadrícula con sus propios
+    píxeles (vectorizado, planificador, vial por celda, cuadrantes), porque las cuadrículas
+    cambiadas se analizan una a una como imágenes de 1 x 1. Si cambió más de fraccion_completa
+    de las cuadrículas se analiza la imagen completa.
+    Devuelve el resultado del analizador, el nuevo estado (para la próxima época) y un informe
+    con el número de cuadrículas reutilizadas y recalculadas.
+    """
+    huellas = huellas_celdas(imagen, num_filas, num_columnas)
+    miniaturas = miniaturas_celdas(imagen, num_filas, num_columnas)
+    if anterior is not None and tuple(anterior["forma"]) != imagen.shape:
+        anterior = None
+    cambiadas = celdas_cambiadas(anterior, huellas, miniaturas, tolerancia)
+
+    if anterior is None or np.count_nonzero(cambiadas) > fraccion_completa * cambiadas.size:
+        cambiadas[:] = True
+        resultados = _como_diccionario(analizador(imagen, num_filas, num_columnas))
+    else:
+        alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+        resultados = {tipo: matriz.copy() for tipo, matriz in anterior["resultados"].items()}
+        for fila, columna in np.argwhere(cambiadas):
+            y_inicio = fila * alto_cuadricula
+            x_inicio = columna * ancho_cuadricula
+            cuadricula = imagen[y_inicio:y_inicio + alto_cuadricula, x_inicio:x_inicio + ancho_cuadricula]
+            for tipo, matriz in _como_diccionario(analizador(cuadricula, 1, 1)).items():
+                resultados[tipo][fila, columna] = matriz[0, 0]
+
+    # Las cuadrículas reutilizadas conservan la huella y la miniatura con las que se calcularon,
+    # así los cambios lentos se acumulan y terminan superando la tolerancia
+    if anterior is not None:
+        huellas = np.where(cambiadas, huellas, anterior["huellas"])
+        miniaturas = np.where(cambiadas[:, :, None, None, None], miniaturas, anterior["miniaturas"])
+    estado = {"forma": np.array(imagen.shape), "huellas": huellas, "miniaturas": miniaturas, "resultados": resultados}
+    recalculadas = int(np.count_nonzero(cambiadas))
+    informe = {"reutilizadas": cambiadas.size - recalculadas, "recalculadas": recalculadas}
+    return resultados.get("__matriz__", resultados), estado, informe
+
+class HistorialCeldas:
+    """
+    Guarda en disco el estado de cada imagen (huellas, miniaturas y resultados por cuadrícula)
+    indexado por un nombre estable, por ejemplo el nombre del archivo de la zona, y los
+    parámetros del análisis. Así la misma zona de otra época se analiza de forma incremental.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_EPOCAS, max_bytes=512 * 1024**2):
+        self._cache = CacheResultados(directorio, max_bytes)
+
+    def _clave(self, nombre, parametros):
+        return self._cache.clave(nombre, algoritmo=ALGORITMO_HUELLA, lado_miniatura=LADO_MINIATURA, **parametros)
+
+    def cargar(self, nombre, **parametros):
+        """
+        Devuelve el estado guardado para el nombre y los parámetros, o None si no hay ninguno.
+        """
+        guardado = self._cache.obtener(self._clave(nombre, parametros))
+        if guardado is None:
+            return None
+        resultados = {k.split("::", 1)[1]: v for k, v in guardado.items() if k.startswith("resultado::")}
+        return {"forma": guardado["forma"], "huellas": guardado["huellas"], "miniaturas": guardado["miniaturas"],
+                "resultados": resultados}
+
+    def guardar(self, nombre, estado, **parametros):
+        """
+        Guarda el estado devuelto por analizar_incremental.
+        """
+        arreglos = {"forma": estado["forma"], "huellas": estado["huellas"], "miniaturas": estado["miniaturas"]}
+        arreglos.update({f"resultado::{tipo}": matriz for tipo, matriz in estado["resultados"].items()})
+        self._cache.guardar(self._clave(nombre, parametros), arreglos)
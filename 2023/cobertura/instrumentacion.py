@@ -0,0 +1,175 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+# Registro activo del proceso; None significa instrumentación desactivada
+_activo = None
+
+class _SinRegistro:
+    # Etapa vacía que se devuelve cuando la instrumentación está desactivada: no mide nada
+    # y es falsa, así que "if medicion:" evita calcular datos que no se van a registrar
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def agregar(self, pixeles=0, bytes_escritos=0):
+        pass
+
+_SIN_REGISTRO = _SinRegistro()
+
+class _Etapa:
+
+    def __init__(self, registro, nombre, pixeles, bytes_escritos):
+        self.registro = registro
+        self.nombre = nombre
+        self.pixeles = pixeles
+        self.bytes_escritos = bytes_escritos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.registro.registrar(self.nombre, self.inicio, time.perf_counter_ns() - self.inicio, self.pixeles,
+                                self.bytes_escritos)
+        return False
+
+    def agregar(self, pixeles=0, bytes_escritos=0):
+        """
+        Suma píxeles o bytes conocidos solo al terminar la etapa (por ejemplo, el tamaño escrito).
+        """
+        self.pixeles += pixeles
+        self.bytes_escritos += bytes_escritos
+
+class Registro:
+    """
+    Tiempos y contadores por etapa (llamadas, segundos, píxeles procesados, bytes escritos),
+    más la lista de eventos para generar una línea de tiempo. Se puede usar desde varios hilos.
+    """
+
+    def __init__(self, guardar_eventos=True):
+        self.guardar_eventos = guardar_eventos
+        self.etapas = {}
+        self.eventos = []
+        self._bloqueo = threading.Lock()
+
+    def registrar(self, nombre, inicio_ns, duracion_ns, pixeles=0, bytes_escritos=0, pid=None, hilo=None):
+        pid = os.getpid() if pid is None else pid
+        hilo = threading.get_ident() if hilo is None else hilo
+        with self._bloqueo:
+            etapa = self.etapas.setdefault(nombre, {"llamadas": 0, "segundos": 0.0, "pixeles": 0, "bytes": 0})
+            etapa["llamadas"] += 1
+            etapa["segundos"] += duracion_ns / 1e9
+            etapa["pixeles"] += int(pixeles)
+            etapa["bytes"] += int(bytes_escritos)
+            if self.guardar_eventos:
+                self.eventos.append((nombre, inicio_ns, duracion_ns, pid, hilo, int(pixeles), int(bytes_escritos)))
+
+    def fusionar(self, eventos):
+        """
+        Agrega los eventos de otro registro (por ejemplo, el de un proceso trabajador).
+        """
+        for nombre, inicio_ns, duracion_ns, pid, hilo, pixeles, bytes_escritos in eventos:
+            self.registrar(nombre, inicio_ns, duracion_ns, pixeles, bytes_escritos, pid, hilo)
+
+    def resumen(self):
+        """
+        Diccionario etapa -> contadores, ordenado de mayor a menor tiempo total.
+        """
+        with self._bloqueo:
+            return dict(sorted(((nombre, dict(etapa)) for nombre, etapa in self.etapas.items()),
+                               key=lambda elemento: -elemento[1]["segundos"]))
+
+    def a_json(self, ruta):
+        """
+        Guarda el resumen por etapa como JSON.
+        """
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump({"etapas": self.resumen()}, archivo, indent=2)
+
+    def a_chrome_trace(self, ruta):
+        """
+        Guarda los eventos en el formato de chrome://tracing y Perfetto (un evento "X" por etapa).
+        """
+        with self._bloqueo:
+            eventos = list(self.eventos)
+        origen = min((inicio for _, inicio, *_ in eventos), default=0)
+        traza = [
+            {"name": nombre, "ph": "X", "ts": (inicio - origen) / 1000, "dur": duracion / 1000, "pid": pid,
+             "tid": hilo, "args": {"pixeles": pixeles, "bytes": bytes_escritos}}
+            for nombre, inicio, duracion, pid, hilo, pixeles, bytes_escritos in eventos
+        ]
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump({"traceEvents": traza, "displayTimeUnit": "ms"}, archivo)
+
+    def guardar(self, ruta):
+        """
+        Guarda el informe en el formato que indica la ruta: *.trace.json para la línea de
+        tiempo de Chrome y cualquier otro nombre para el resumen JSON.
+        """
+        if ruta.endswith(".trace.json"):
+            self.a_chrome_trace(ruta)
+        else:
+            self.a_json(ruta)
+
+def activar(registro=None):
+    """
+    Activa la instrumentación en este proceso y devuelve el registro que la recibe.
+    """
+    global _activo
+    _activo = registro if registro is not None else Registro()
+    return _activo
+
+def desactivar():
+    """
+    Desactiva la instrumentación y devuelve el registro que estaba activo.
+    """
+    global _activo
+    registro, _activo = _activo, None
+    return registro
+
+def registro_activo():
+    return _activo
+
+class instrumentar:
+    """
+    Contexto que activa la instrumentación y la desactiva al salir:
+
+        with instrumentar() as registro:
+            analizar_multiple(imagen, 30, 15)
+        registro.guardar("perfil.trace.json")
+    """
+
+    def __init__(self, registro=None):
+        self.registro = registro if registro is not None else Registro()
+
+    def __enter__(self):
+        self._anterior = _activo
+        return activar(self.registro)
+
+    def __exit__(self, *excepcion):
+        global _activo
+        _activo = self._anterior
+        return False
+
+def etapa(nombre, pixeles=0, bytes_escritos=0):
+    """
+    Mide una etapa con "with etapa(nombre, pixeles):". Si la instrumentación está desactivada
+    devuelve un contexto vacío compartido, sin medir tiempo ni crear objetos.
+    """
+    if _activo is None:
+        return _SIN_REGISTRO
+    return _Etapa(_activo, nombre, pixeles, bytes_escritos)
+
+# Con COBERTURA_PERFIL=<ruta> la instrumentación se activa al importar el módulo y el informe
+# se guarda al terminar el proceso, así también se pueden medir los scripts sin modificarlos
+if os.environ.get("COBERTURA_PERFIL"):
+    atexit.register(Registro.guardar, activar(), os.environ["COBERTURA_PERFIL"])
@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+
+from cobertura.vectorizado import cuantizar_cobertura, mascara_imagen
+
+class IndiceIntegral:
+    """
+    Tabla de áreas acumuladas (imagen integral) de una máscara binaria.
+    Se construye una sola vez y permite contar los píxeles detectados de cualquier
+    rectángulo con cuatro lecturas, sin volver a recorrer la imagen.
+    """
+
+    def __init__(self, tabla):
+        # tabla[y, x] = píxeles detectados en mascara[:y, :x]
+        self.tabla = tabla
+
+    @classmethod
+    def desde_mascara(cls, mascara):
+        """
+        Construye el índice a partir de una máscara (cualquier valor distinto de cero cuenta).
+        """
+        binaria = (np.asarray(mascara) != 0).astype(np.uint8)
+        if binaria.size < 2**31:
+            return cls(cv2.integral(binaria, sdepth=cv2.CV_32S))
+        # Para máscaras enormes se acumula en 64 bits para evitar desbordamientos
+        tabla = np.zeros((binaria.shape[0] + 1, binaria.shape[1] + 1), dtype=np.int64)
+        np.cumsum(binaria, axis=0, dtype=np.int64, out=tabla[1:, 1:])
+        np.cumsum(tabla[1:, 1:], axis=1, out=tabla[1:, 1:])
+        return cls(tabla)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Carga un índice guardado con guardar(); se abre mapeado en memoria.
+        """
+        return cls(np.load(ruta, mmap_mode="r"))
+
+    def guardar(self, ruta):
+        """
+        Guarda el índice en disco en formato .npy para reutilizarlo entre ejecuciones.
+        """
+        np.save(ruta, self.tabla)
+
+    @property
+    def alto(self):
+        return self.tabla.shape[0] - 1
+
+    @property
+    def ancho(self):
+        return self.tabla.shape[1] - 1
+
+    def contar(self, y_inicio, x_inicio, y_fin, x_fin):
+        """
+        Cuenta los píxeles detectados en los rectángulos [y_inicio:y_fin, x_inicio:x_fin].
+        Acepta escalares o arreglos (se hace broadcasting) y recorta a los límites de la imagen.
+        """
+        y0 = np.clip(y_inicio, 0, self.alto)
+        y1 = np.clip(y_fin, 0, self.alto)
+        x0 = np.clip(x_inicio, 0, self.ancho)
+        x1 = np.clip(x_fin, 0, self.ancho)
+        t = self.tabla
+        return t[y1, x1] - t[y0, x1] - t[y1, x0] + t[y0, x0]
+
+    def contar_celdas(self, alto_celda, ancho_celda, num_filas, num_columnas, y_offset=0, x_offset=0,
+                      paso_y=None, paso_x=None):
+        """
+        Cuenta los píxeles detectados en una rejilla de celdas de alto_celda x ancho_celda
+        que empieza en (y_offset, x_offset). Con paso_y/paso_x menores que el tamaño de la
+        celda se obtienen ventanas superpuestas.
+        """
+        paso_y = alto_celda if paso_y is None else paso_y
+        paso_x = ancho_celda if paso_x is None else paso_x
+        y0 = (y_offset + np.arange(num_filas) * paso_y)[:, None]
+        x0 = (x_offset + np.arange(num_columnas) * paso_x)[None, :]
+        return self.contar(y0, x0, y0 + alto_celda, x0 + ancho_celda)
+
+    def contar_cuadricula(self, num_filas, num_columnas, y_offset=0, x_offset=0):
+        """
+        Cuenta los píxeles por cuadrícula usando el mismo tamaño de celda que
+        analizar_cuadriculas (alto // num_filas, ancho // num_columnas).
+        Devuelve la matriz de conteos y los píxeles de cada celda.
+        """
+        alto_cuadricula = (self.alto - y_offset) // num_filas
+        ancho_cuadricula = (self.ancho - x_offset) // num_columnas
+        conteos = self.contar_celdas(alto_cuadricula, ancho_cuadricula, num_filas, num_columnas,
+                                     y_offset, x_offset)
+        return conteos, alto_cuadricula * ancho_cuadricula
+
+    def cobertura_cuadricula(self, num_filas, num_columnas, umbral_porcentaje, y_offset=0, x_offset=0):
+        """
+        Matriz de cobertura 0/25/50/75/100 para la cuadrícula indicada.
+        """
+        conteos, pixeles_totales = self.contar_cuadricula(num_filas, num_columnas, y_offset, x_offset)
+        return cuantizar_cobertura(conteos, pixeles_totales, umbral_porcentaje)
+
+    def ventanas_deslizantes(self, alto_ventana, ancho_ventana, paso_y, paso_x):
+        """
+        Porcentaje detectado en todas las ventanas que caben completas en la imagen.
+        """
+        num_filas = (self.alto - alto_ventana) // paso_y + 1
+        num_columnas = (self.ancho - ancho_ventana) // paso_x + 1
+        conteos = self.contar_celdas(alto_ventana, ancho_ventana, num_filas, num_columnas,
+                                     paso_y=paso_y, paso_x=paso_x)
+        return conteos / (alto_ventana * ancho_ventana) * 100
+
+def construir_indice(imagen, tipo="vegetal", **parametros):
+    """
+    Construye el índice integral de la máscara de un tipo de análisis sobre la imagen completa.
+    Para "vial" los bordes se calculan sobre toda la imagen y no por celda, por lo que el
+    resultado puede diferir ligeramente de analizar_cuadriculas en los bordes de las celdas.
+    """
+    return IndiceIntegral.desde_mascara(mascara_imagen(imagen, 1, 1, tipo, **parametros))
@@ -0,0 +1,367 @@
+import argparse
+import glob
+import inspect
+import os
+import signal
+import time
+
+from cobertura.cache import DIRECTORIO_CACHE, VERSION_ANALISIS, CacheResultados, huella_archivo
+from cobertura.carga import DIRECTORIO_IMAGENES, CacheImagenes, cargar_para_analisis
+from cobertura.incremental import DIRECTORIO_EPOCAS, HistorialCeldas, analizar_incremental
+from cobertura.instrumentacion import Registro, activar, desactivar, registro_activo
+from cobertura.planificador import ANALISIS, Plan
+from cobertura.vectorizado import parametros_de
+from cobertura.vial import (
+    analizar_cuadriculas_vial,
+    analizar_cuadriculas_vial_global,
+    analizar_cuadriculas_vial_gris,
+    analizar_cuadriculas_vial_gris_global,
+    calcular_cobertura_vial_gris,
+)
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+
+# Análisis viales por celda disponibles además de los del planificador
+ANALISIS_VIAL = {
+    "vial_hough": analizar_cuadriculas_vial,
+    "vial_gris": analizar_cuadriculas_vial_gris,
+    "vial_global": analizar_cuadriculas_vial_global,
+    "vial_gris_global": analizar_cuadriculas_vial_gris_global,
+}
+
+# Análisis en los que las líneas cruzan cuadrículas: una cuadrícula no se puede recalcular sola
+ANALISIS_GLOBALES = ("vial_global", "vial_gris_global")
+
+# El tiempo máximo por imagen se aplica con SIGALRM, que no existe en Windows
+TIMEOUT_DISPONIBLE = hasattr(signal, "SIGALRM")
+
+# Argumentos de los analizadores que no son parámetros del análisis: salidas y desplazamientos
+_NO_PARAMETROS = ("diagnostico", "nombre_archivo", "imagen_lineas", "capa", "x_offset", "y_offset")
+
+def _valores_por_defecto(*funciones):
+    valores = {}
+    for funcion in funciones:
+        for nombre, parametro in inspect.signature(funcion).parameters.items():
+            if parametro.default is not inspect.Parameter.empty and nombre not in _NO_PARAMETROS:
+                valores[nombre] = parametro.default
+    return valores
+
+def parametros_analisis(analisis):
+    """
+    Parámetros efectivos de cada análisis pedido (rangos HSV, umbrales, etc.), para que las
+    claves de la caché y del historial incremental cambien si cambian los valores por defecto.
+    """
+    parametros = {}
+    for tipo in analisis:
+        if tipo in ANALISIS:
+            parametros[tipo] = parametros_de(tipo)
+        elif tipo == "vial_gris":
+            # Sus parámetros adicionales se pasan a calcular_cobertura_vial_gris
+            parametros[tipo] = _valores_por_defecto(ANALISIS_VIAL[tipo], calcular_cobertura_vial_gris)
+        else:
+            parametros[tipo] = _valores_por_defecto(ANALISIS_VIAL[tipo])
+    return parametros
+
+def listar_imagenes(entrada):
+    """
+    Devuelve las imágenes de un directorio o las rutas que coinciden con un patrón glob.
+    """
+    if os.path.isdir(entrada):
+        rutas = [os.path.join(entrada, nombre) for nombre in os.listdir(entrada)]
+    else:
+        rutas = glob.glob(entrada, recursive=True)
+    return sorted(ruta for ruta in rutas if os.path.splitext(ruta)[1].lower() in EXTENSIONES)
+
+def analizar_imagen(imagen, num_filas, num_columnas, analisis, umbral_longitud=50):
+    """
+    Realiza sobre una imagen ya cargada los análisis pedidos (los del planificador en una
+    sola pasada y los viales por celda). Devuelve un diccionario tipo -> matriz.
+    """
+    tipos_plan = [tipo for tipo in analisis if tipo in ANALISIS]
+    resultados = Plan(tipos_plan).ejecutar(imagen, num_filas, num_columnas) if tipos_plan else {}
+    for tipo in analisis:
+        if tipo in ANALISIS_VIAL:
+            resultados[tipo] = ANALISIS_VIAL[tipo](imagen, num_filas, num_columnas, umbral_longitud)
+    return {tipo: resultados[tipo] for tipo in analisis}
+
+def analizar_imagen_incremental(imagen, nombre, num_filas, num_columnas, analisis, umbral_longitud=50,
+                                directorio_incremental=DIRECTORIO_EPOCAS, tolerancia=0):
+    """
+    Como analizar_imagen, pero reutiliza los resultados de las cuadrículas que no cambiaron desde
+    el último análisis de una imagen con el mismo nombre (la misma zona en otra época).
+    Los análisis globales se calculan siempre completos. Devuelve los resultados y el informe
+    de cuadrículas reutilizadas y recalculadas.
+    """
+    por_celda = [tipo for tipo in analisis if tipo not in ANALISIS_GLOBALES]
+    globales = [tipo for tipo in analisis if tipo in ANALISIS_GLOBALES]
+    resultados = analizar_imagen(imagen, num_filas, num_columnas, globales, umbral_longitud) if globales else {}
+    informe = {"reutilizadas": 0, "recalculadas": 0}
+    if por_celda:
+        historial = HistorialCeldas(directorio_incremental)
+        parametros = {"analisis": por_celda, "num_filas": num_filas, "num_columnas": num_columnas,
+                      "umbral_longitud": umbral_longitud, "parametros": parametros_analisis(por_celda),
+                      "version": VERSION_ANALISIS}
+        matrices, estado, informe = analizar_incremental(
+            imagen, num_filas, num_columnas,
+            lambda zona, filas, columnas: analizar_imagen(zona, filas, columnas, por_celda, umbral_longitud),
+            historial.cargar(nombre, **parametros), tolerancia
+        )
+        historial.guardar(nombre, estado, **parametros)
+        resultados.update(matrices)
+    return {tipo: resultados[tipo] for tipo in analisis}, informe
+
+def clave_resultados(cache, ruta, num_filas, num_columnas, analisis, umbral_longitud=50, min_pixeles_celda=None):
+    """
+    Clave de CacheResultados para los resultados de una imagen: el hash del archivo y todo lo
+    que cambia el resultado del análisis.
+    """
+    return cache.clave(huella_archivo(ruta), analisis=list(analisis), num_filas=num_filas,
+                       num_columnas=num_columnas, umbral_longitud=umbral_longitud,
+                       min_pixeles_celda=min_pixeles_celda, parametros=parametros_analisis(analisis),
+                       version=VERSION_ANALISIS)
+
+def rondas_incrementales(rutas):
+    """
+    Reparte las rutas en rondas sin nombres de archivo repetidos. El historial incremental se
+    indexa por nombre de archivo, así que dos imágenes con el mismo nombre (la misma zona en
+    épocas distintas, en directorios distintos) no pueden analizarse a la vez: se analizan en
+    rondas sucesivas, en el orden de sus rutas.
+    """
+    por_nombre = {}
+    for ruta in sorted(rutas):
+        por_nombre.setdefault(os.path.basename(ruta), []).append(ruta)
+    rondas = []
+    for grupo in por_nombre.values():
+        for indice, ruta in enumerate(grupo):
+            if indice == len(rondas):
+                rondas.append([])
+            rondas[indice].append(ruta)
+    return rondas
+
+def _tiempo_agotado(signum, frame):
+    raise TimeoutError("Tiempo agotado analizando la imagen.")
+
+def procesar_imagen(ruta, num_filas, num_columnas, analisis, umbral_longitud=50, timeout=None, directorio_cache=None,
+                    directorio_incremental=None, tolerancia=0, min_pixeles_celda=None, directorio_imagenes=None,
+                    informe=None):
+    """
+    Carga una imagen y realiza los análisis pedidos. Devuelve un diccionario tipo -> matriz.
+    Si se indica timeout (segundos) se interrumpe el análisis con TimeoutError; solo en sistemas
+    con SIGALRM (no en Windows), si no se lanza ValueError.
+    Con directorio_cache, una imagen ya analizada con los mismos parámetros se resuelve con el
+    hash del archivo, sin decodificarla.
+    Con directorio_incremental se analizan solo las cuadrículas que cambiaron desde la última
+    imagen con el mismo nombre de archivo (ver analizar_imagen_incremental); si se pasa un
+    diccionario informe, se le suman las cuadrículas reutilizadas y recalculadas.
+    Si ningún análisis usa color la imagen se decodifica directamente en gris; con
+    min_pixeles_celda, si todos son de área, se decodifica reducida mientras cada cuadrícula
+    conserve ese número de píxeles de lado; el resultado es aproximado (ver cobertura.carga).
+    Con directorio_imagenes la imagen decodificada se guarda en una CacheImagenes y las
+    próximas veces no se decodifica.
+    """
+    if timeout and not TIMEOUT_DISPONIBLE:
+        raise ValueError("El tiempo máximo por imagen requiere SIGALRM, que no existe en este sistema.")
+    if directorio_cache:
+        cache = CacheResultados(directorio_cache)
+        clave = clave_resultados(cache, ruta, num_filas, num_columnas, analisis, umbral_longitud, min_pixeles_celda)
+        guardado = cache.obtener(clave)
+        if guardado is not None:
+            if informe is not None and directorio_incremental:
+                informe["reutilizadas"] = informe.get("reutilizadas", 0) + num_filas * num_columnas
+            return {tipo: guardado[tipo] for tipo in analisis}
+        resultados = procesar_imagen(ruta, num_filas, num_columnas, analisis, umbral_longitud, timeout, None,
+                                     directorio_incremental, tolerancia, min_pixeles_celda, directorio_imagenes,
+                                     informe)
+        cache.guardar(clave, resultados)
+        return resultados
+
+    if timeout:
+        signal.signal(signal.SIGALRM, _tiempo_agotado)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        cache_imagenes = CacheImagenes(directorio_imagenes) if directorio_imagenes else None
+        imagen = cargar_para_analisis(ruta, analisis, num_filas, num_columnas, min_pixeles_celda, cache_imagenes)
+        if not directorio_incremental:
+            return analizar_imagen(imagen, num_filas, num_columnas, analisis, umbral_longitud)
+        resultados, celdas = analizar_imagen_incremental(imagen, os.path.basename(ruta), num_filas, num_columnas,
+                                                         analisis, umbral_longitud, directorio_incremental, tolerancia)
+        if informe is not None:
+            for clave, cantidad in celdas.items():
+                informe[clave] = informe.get(clave, 0) + cantidad
+        return resultados
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def _procesar_en_trabajador(instrumentado, *argumentos):
+    # En el proceso trabajador se devuelve también el informe de cuadrículas y, si se pidió
+    # instrumentación, los eventos medidos en un registro propio
+    registro = activar(Registro()) if instrumentado else None
+    informe = {}
+    try:
+        return procesar_imagen(*argumentos, informe=informe), informe, registro.eventos if registro else []
+    finally:
+        if registro is not None:
+            desactivar()
+
+def ejecutar_lote(rutas, num_filas, num_columnas, analisis, umbral_longitud=50, procesos=None, timeout=None,
+                  exportador=None, directorio_cache=None, directorio_incremental=None, tolerancia=0,
+                  min_pixeles_celda=None, directorio_imagenes=None, informe=None):
+    """
+    Reparte las imágenes entre varios procesos (por defecto uno por núcleo). Con un solo
+    proceso o una sola imagen se analizan aquí mismo, sin arrancar procesos trabajadores.
+    Devuelve los resultados por ruta, los errores por ruta y el tiempo total en segundos.
+    Si se pasa un exportador, los resultados de cada imagen se exportan en cuanto terminan.
+    Si la instrumentación está activa, los tiempos de los trabajadores se suman al registro activo.
+    Con directorio_incremental, informe (un diccionario) recibe el total de cuadrículas
+    reutilizadas y recalculadas, y las imágenes con el mismo nombre se analizan una tras otra
+    (ver rondas_incrementales).
+    """
+    if timeout and not TIMEOUT_DISPONIBLE:
+        raise ValueError("El tiempo máximo por imagen requiere SIGALRM, que no existe en este sistema.")
+    resultados = {}
+    errores = {}
+    argumentos = (num_filas, num_columnas, analisis, umbral_longitud, timeout, directorio_cache,
+                  directorio_incremental, tolerancia, min_pixeles_celda, directorio_imagenes)
+    inicio = time.perf_counter()
+
+    def recibir(ruta, obtener):
+        try:
+            resultados[ruta] = obtener()
+        except Exception as error:
+            errores[ruta] = str(error)
+            return
+        if exportador is not None:
+            exportador.agregar_matrices(ruta, resultados[ruta])
+
+    procesos = procesos or os.cpu_count()
+    if procesos == 1 or len(rutas) <= 1:
+        for ruta in sorted(rutas) if directorio_incremental else rutas:
+            recibir(ruta, lambda: procesar_imagen(ruta, *argumentos, informe=informe))
+        return resultados, errores, time.perf_counter() - inicio
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    registro = registro_activo()
+
+    def resultado_de(futuro):
+        resultado, celdas, eventos = futuro.result()
+        if registro is not None:
+            registro.fusionar(eventos)
+        if informe is not None:
+            for clave, cantidad in celdas.items():
+                informe[clave] = informe.get(clave, 0) + cantidad
+        return resultado
+
+    rondas = rondas_incrementales(rutas) if directorio_incremental else [rutas]
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        for ronda in rondas:
+            futuros = {ejecutor.submit(_procesar_en_trabajador, registro is not None, ruta, *argumentos): ruta
+                       for ruta in ronda}
+            for futuro in as_completed(futuros):
+                recibir(futuros[futuro], lambda: resultado_de(futuro))
+    return resultados, errores, time.perf_counter() - inicio
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Analiza la cobertura por cuadrículas de un lote de imágenes.")
+    parser.add_argument("entrada", help="Directorio o patrón glob con las imágenes")
+    parser.add_argument("--filas", type=int, default=30)
+    parser.add_argument("--columnas", type=int, default=15)
+    parser.add_argument("--analisis", default="vegetal,urbanistico",
+                        help=f"Lista separada por comas: {', '.join([*ANALISIS, *ANALISIS_VIAL])}")
+    parser.add_argument("--umbral-longitud", type=float, default=50)
+    parser.add_argument("--procesos", type=int, default=None, help="Por defecto, uno por núcleo")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Segundos máximos por imagen (no disponible en Windows)")
+    parser.add_argument("--cache", nargs="?", const=DIRECTORIO_CACHE, default=None,
+                        help=f"Reutiliza resultados guardados (por defecto en {DIRECTORIO_CACHE})")
+    parser.add_argument("--incremental", nargs="?", const=DIRECTORIO_EPOCAS, default=None,
+                        help="Recalcula solo las cuadrículas que cambiaron desde la última imagen con el mismo "
+                             f"nombre de archivo (estado por defecto en {DIRECTORIO_EPOCAS})")
+    parser.add_argument("--tolerancia", type=float, default=0,
+                        help="Con --incremental, diferencia media (0-255) de la miniatura de una cuadrícula a "
+                             "partir de la cual se considera cambiada; 0 compara los píxeles exactos")
+    parser.add_argument("--min-pixeles-celda", type=int, default=None,
+                        help="Con análisis de área (vegetal, urbanistico), decodifica la imagen reducida 2, 4 u 8 "
+                             "veces mientras cada cuadrícula conserve al menos estos píxeles de lado. El resultado "
+                             "es aproximado: algunas cuadrículas cambian de nivel")
+    parser.add_argument("--cache-imagenes", nargs="?", const=DIRECTORIO_IMAGENES, default=None,
+                        help="Guarda las imágenes decodificadas y las reutiliza proyectadas en memoria en las "
+                             f"próximas ejecuciones (por defecto en {DIRECTORIO_IMAGENES})")
+    parser.add_argument("--canalizacion", action="store_true",
+                        help="Solapa decodificación, análisis, superposiciones y exportación en una canalización")
+    parser.add_argument("--superposiciones", default=None,
+                        help="Con --canalizacion, directorio donde guardar cada imagen con su cobertura superpuesta")
+    parser.add_argument("--concurrencia", default="",
+                        help="Con --canalizacion, tareas por etapa, por ejemplo decodificar=2,analizar=4,superponer=1")
+    parser.add_argument("--salida", default="resultados_lote.npz",
+                        help="Archivo .npz, .csv, .xlsx o .parquet; si ya existe se reemplaza")
+    parser.add_argument("--anadir", action="store_true",
+                        help="Amplía el .npz o .csv de --salida si ya existe; en un .npz, las imágenes que ya "
+                             "estaban se reemplazan")
+    parser.add_argument("--perfil", default=None,
+                        help="Guarda los tiempos por etapa: resumen JSON o línea de tiempo si termina en .trace.json")
+    args = parser.parse_args(argumentos)
+
+    analisis = [tipo.strip() for tipo in args.analisis.split(",") if tipo.strip()]
+    desconocidos = [tipo for tipo in analisis if tipo not in ANALISIS and tipo not in ANALISIS_VIAL]
+    if desconocidos:
+        parser.error(f"Análisis no reconocidos: {', '.join(desconocidos)}")
+
+    concurrencia = {}
+    for elemento in filter(None, args.concurrencia.split(",")):
+        nombre, _, cantidad = elemento.partition("=")
+        if nombre.strip() not in ("decodificar", "analizar", "superponer") or not cantidad.strip().isdigit():
+            parser.error(f"Concurrencia no válida: {elemento}")
+        concurrencia[nombre.strip()] = max(1, int(cantidad))
+    if args.timeout and not TIMEOUT_DISPONIBLE:
+        parser.error("--timeout no está disponible en este sistema (requiere SIGALRM)")
+    if args.canalizacion and args.timeout:
+        parser.error("--canalizacion no admite --timeout: SIGALRM solo interrumpe el hilo principal")
+    if (args.superposiciones or concurrencia) and not args.canalizacion:
+        parser.error("--superposiciones y --concurrencia requieren --canalizacion")
+
+    rutas = listar_imagenes(args.entrada)
+    if not rutas:
+        print("No se encontraron imágenes.")
+        return 1
+
+    # Los exportadores (y pandas, pyarrow o xlsxwriter) solo se cargan cuando se va a exportar
+    from cobertura.exportadores import crear_exportador
+
+    registro = activar() if args.perfil else None
+    informe = {"reutilizadas": 0, "recalculadas": 0}
+    with crear_exportador(args.salida, args.anadir) as exportador:
+        if args.canalizacion:
+            from cobertura.canalizacion import ejecutar_canalizacion
+
+            # Sin --procesos el análisis usa hilos; con más de un proceso, un grupo de procesos
+            procesos = args.procesos is not None and args.procesos > 1
+            if procesos:
+                concurrencia.setdefault("analizar", args.procesos)
+            resultados, errores, segundos = ejecutar_canalizacion(
+                rutas, args.filas, args.columnas, analisis, args.umbral_longitud, exportador, args.superposiciones,
+                concurrencia, procesos=procesos, directorio_incremental=args.incremental,
+                tolerancia=args.tolerancia, min_pixeles_celda=args.min_pixeles_celda,
+                directorio_imagenes=args.cache_imagenes, directorio_cache=args.cache, informe=informe
+            )
+        else:
+            resultados, errores, segundos = ejecutar_lote(
+                rutas, args.filas, args.columnas, analisis, args.umbral_longitud, args.procesos, args.timeout,
+                exportador, args.cache, args.incremental, args.tolerancia, args.min_pixeles_celda,
+                args.cache_imagenes, informe
+            )
+    if registro is not None:
+        desactivar()
+        registro.guardar(args.perfil)
+        print(f"Tiempos por etapa en {args.perfil}.")
+    if args.incremental:
+        print(f"Cuadrículas reutilizadas: {informe['reutilizadas']}, recalculadas: {informe['recalculadas']}.")
+    for ruta, error in sorted(errores.items()):
+        print(f"Error en {ruta}: {error}")
+    print(f"{len(resultados)} de {len(rutas)} imágenes analizadas en {segundos:.2f} s "
+          f"({len(resultados) / segundos:.2f} imágenes/s). Resultados en {args.salida}.")
+    return 0 if not errores else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
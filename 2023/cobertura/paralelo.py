@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from cobertura.lote import analizar_imagen
+from cobertura.vectorizado import tamano_cuadricula
+
+# Estado de cada proceso trabajador: vistas sobre la memoria compartida
+_compartido = {}
+
+def _adjuntar(nombre, forma, dtype):
+    memoria = shared_memory.SharedMemory(name=nombre)
+    return memoria, np.ndarray(forma, dtype=dtype, buffer=memoria.buf)
+
+def _iniciar_trabajador(imagen_shm, resultados_shm):
+    _compartido["imagen"] = _adjuntar(*imagen_shm)
+    _compartido["resultados"] = _adjuntar(*resultados_shm)
+
+def _analizar_bloque(fila_inicio, filas, alto_cuadricula, num_columnas, analisis, umbral_longitud):
+    imagen = _compartido["imagen"][1]
+    resultados = _compartido["resultados"][1]
+    # La franja es una vista de la memoria compartida: no se copian ni serializan píxeles
+    franja = imagen[fila_inicio * alto_cuadricula:(fila_inicio + filas) * alto_cuadricula]
+    por_tipo = analizar_imagen(franja, filas, num_columnas, analisis, umbral_longitud)
+    for indice, tipo in enumerate(analisis):
+        resultados[indice, fila_inicio:fila_inicio + filas] = por_tipo[tipo]
+
+def analizar_en_paralelo(imagen, num_filas, num_columnas, analisis, umbral_longitud=50, procesos=None,
+                         filas_por_tarea=1):
+    """
+    Reparte las filas de cuadrículas de una imagen grande entre varios procesos.
+    La imagen y la matriz de resultados viven en memoria compartida, así que los trabajadores
+    leen sus celdas y escriben sus resultados sin copiar píxeles. Devuelve tipo -> matriz.
+    """
+    alto_cuadricula, _ = tamano_cuadricula(imagen, num_filas, num_columnas)
+    forma_resultados = (len(analisis), num_filas, num_columnas)
+
+    memoria_imagen = shared_memory.SharedMemory(create=True, size=imagen.nbytes)
+    memoria_resultados = shared_memory.SharedMemory(create=True, size=int(np.prod(forma_resultados)) * 8)
+    resultados = None
+    try:
+        np.ndarray(imagen.shape, dtype=imagen.dtype, buffer=memoria_imagen.buf)[:] = imagen
+        resultados = np.ndarray(forma_resultados, dtype=np.int64, buffer=memoria_resultados.buf)
+
+        iniciales = ((memoria_imagen.name, imagen.shape, imagen.dtype),
+                     (memoria_resultados.name, forma_resultados, np.int64))
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count(), initializer=_iniciar_trabajador,
+                                 initargs=iniciales) as ejecutor:
+            tareas = [
+                ejecutor.submit(_analizar_bloque, fila, min(filas_por_tarea, num_filas - fila), alto_cuadricula,
+                                num_columnas, analisis, umbral_longitud)
+                for fila in range(0, num_filas, filas_por_tarea)
+            ]
+            for tarea in tareas:
+                tarea.result()
+
+        return {tipo: resultados[indice].astype(int) for indice, tipo in enumerate(analisis)}
+    finally:
+        # Las vistas deben soltarse antes de cerrar la memoria compartida
+        resultados = None
+        memoria_imagen.close()
+        memoria_imagen.unlink()
+        memoria_resultados.close()
+        memoria_resultados.unlink()
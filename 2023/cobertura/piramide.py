@@ -0,0 +1,66 @@
+import numpy as np
+
+from cobertura.cache import con_cache
+from cobertura.vectorizado import (analizar_cuadriculas_vectorizado, cuantizar_cobertura, mascara_imagen,
+                                   parametros_de, tamano_cuadricula)
+
+# Límites de cuantización de cuantizar_cobertura (además del umbral de cada análisis)
+LIMITES_COBERTURA = (12.5, 37.5, 62.5)
+
+def estimar_porcentajes(imagen, num_filas, num_columnas, tipo="vegetal", niveles=2, usar_lut=False, **parametros):
+    """
+    Porcentaje aproximado de cada cuadrícula usando uno de cada 2**niveles píxeles en cada eje.
+    La muestra se toma dentro de cada cuadrícula, así que cada celda se estima solo con sus
+    propios píxeles y no se mezclan colores de celdas vecinas.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    paso = 2 ** niveles
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    celdas = zona.reshape(num_filas, alto_cuadricula, num_columnas, ancho_cuadricula, -1)
+    muestra = celdas[:, paso // 2::paso, :, paso // 2::paso]
+    alto_muestra, ancho_muestra = muestra.shape[1], muestra.shape[3]
+    reducida = np.ascontiguousarray(muestra.reshape(num_filas * alto_muestra, num_columnas * ancho_muestra, -1))
+
+    mascara = mascara_imagen(reducida, num_filas, num_columnas, tipo, usar_lut, **parametros)
+    detectados = np.count_nonzero(mascara.reshape(num_filas, alto_muestra, num_columnas, ancho_muestra), axis=(1, 3))
+    return detectados / (alto_muestra * ancho_muestra) * 100
+
+def celdas_dudosas(porcentajes, umbral_porcentaje, tolerancia=5.0):
+    """
+    Cuadrículas cuya estimación está a menos de tolerancia puntos de algún límite de
+    cuantización o del umbral: son las únicas en las que la estimación puede cambiar el resultado.
+    """
+    limites = np.array(LIMITES_COBERTURA + (umbral_porcentaje,))
+    return (np.abs(np.asarray(porcentajes)[..., None] - limites) <= tolerancia).any(axis=-1)
+
+@con_cache
+def analizar_cuadriculas_piramide(imagen, num_filas, num_columnas, tipo="vegetal", tolerancia=5.0, niveles=2,
+                                  usar_lut=False, **parametros):
+    """
+    Igual que analizar_cuadriculas_vectorizado, pero primero estima la cobertura con una
+    muestra reducida y solo recalcula a resolución completa las cuadrículas dudosas.
+    Una tolerancia mayor recalcula más cuadrículas y se equivoca menos; con tolerancia=100
+    el resultado es exacto. El análisis vial depende de Canny por celda y siempre se
+    calcula completo, igual que las cuadrículas demasiado pequeñas para tomar una muestra.
+    """
+    p = parametros_de(tipo, **parametros)
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    # La muestra toma los píxeles paso // 2, paso // 2 + paso, ... de cada cuadrícula
+    if tipo == "vial" or min(alto_cuadricula, ancho_cuadricula) <= 2 ** niveles // 2:
+        return analizar_cuadriculas_vectorizado(imagen, num_filas, num_columnas, tipo, usar_lut, **parametros)
+
+    porcentajes = estimar_porcentajes(imagen, num_filas, num_columnas, tipo, niveles, usar_lut, **parametros)
+    dudosas = celdas_dudosas(porcentajes, p["umbral"], tolerancia)
+
+    # Se trabaja en píxeles para que las cuadrículas recalculadas se cuanticen exactamente
+    # igual que en analizar_cuadriculas_vectorizado
+    pixeles_totales = alto_cuadricula * ancho_cuadricula
+    detectados = porcentajes / 100 * pixeles_totales
+    for fila, columna in zip(*np.nonzero(dudosas)):
+        y_inicio = fila * alto_cuadricula
+        x_inicio = columna * ancho_cuadricula
+        cuadricula = imagen[y_inicio:y_inicio + alto_cuadricula, x_inicio:x_inicio + ancho_cuadricula]
+        mascara = mascara_imagen(cuadricula, 1, 1, tipo, usar_lut, **parametros)
+        detectados[fila, columna] = np.count_nonzero(mascara)
+
+    return cuantizar_cobertura(detectados, pixeles_totales, p["umbral"])
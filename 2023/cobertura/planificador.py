@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+
+from cobertura.cache import con_cache
+from cobertura.instrumentacion import etapa
+from cobertura.vectorizado import a_gris, contar_por_celda, cuantizar_cobertura, parametros_de, tamano_cuadricula
+
+def _dilatar(bordes, p):
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    return cv2.dilate(bordes, kernel, iterations=1)
+
+# Resultados intermedios que pueden compartir los análisis.
+# nombre: (entrada, alcance, función(entrada, parámetros), parámetros que usa)
+# El alcance "imagen" indica una operación píxel a píxel que puede hacerse sobre toda la
+# imagen de una vez; "celda" indica que depende de los bordes de cada cuadrícula.
+INTERMEDIOS = {
+    "hsv": ("bgr", "imagen", lambda bgr, p: cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV), ()),
+    "gris": ("bgr", "imagen", lambda bgr, p: a_gris(bgr), ()),
+    "bordes": ("gris", "celda", lambda gris, p: cv2.Canny(gris, p["canny_bajo"], p["canny_alto"]),
+               ("canny_bajo", "canny_alto")),
+    "bordes_dilatados": ("bordes", "celda", _dilatar, ()),
+}
+
+# Cada análisis declara el intermedio que necesita y cómo obtener su máscara a partir de él.
+ANALISIS = {
+    "vegetal": ("hsv", lambda hsv, p: cv2.inRange(hsv, np.array(p["verde_bajo"]), np.array(p["verde_alto"]))),
+    "urbanistico": ("gris", lambda gris, p: cv2.threshold(gris, p["umbral_gris"], 255, cv2.THRESH_BINARY)[1]),
+    "vial": ("bordes_dilatados", lambda bordes, p: bordes),
+}
+
+class Plan:
+    """
+    Plan de ejecución para varios análisis sobre la misma cuadrícula.
+    Cada intermedio distinto (según su nombre, su entrada y sus parámetros) se calcula una
+    sola vez, ya sea para toda la imagen o una vez por celda, y alimenta a todos los análisis.
+    Con fusionado=True los análisis píxel a píxel se cuentan con el núcleo de cobertura.fusionado
+    (si numba está instalado), sin crear sus imágenes intermedias ni sus máscaras.
+    """
+
+    def __init__(self, tipos, parametros=None, fusionado=False):
+        parametros = parametros or {}
+        self.fusionado = fusionado
+        self.nodos = {}  # clave -> (nombre, clave de la entrada, parámetros), en orden topológico
+        self.analisis = []  # (tipo, clave del intermedio, parámetros)
+        for tipo in tipos:
+            p = parametros_de(tipo, **parametros.get(tipo, {}))
+            self.analisis.append((tipo, self._agregar(ANALISIS[tipo][0], p), p))
+
+        # Un intermedio es por celda si lo es él mismo o cualquiera de sus entradas
+        self.por_celda = set()
+        for clave, (nombre, entrada, _) in self.nodos.items():
+            if INTERMEDIOS[nombre][1] == "celda" or entrada in self.por_celda:
+                self.por_celda.add(clave)
+
+    def _agregar(self, nombre, p):
+        if nombre == "bgr":
+            return ("bgr",)
+        entrada, _, _, usados = INTERMEDIOS[nombre]
+        clave_entrada = self._agregar(entrada, p)
+        clave = (nombre, clave_entrada) + tuple(p[k] for k in usados)
+        if clave not in self.nodos:
+            self.nodos[clave] = (nombre, clave_entrada, p)
+        return clave
+
+    def intermedios(self):
+        """
+        Nombres de los intermedios que se calcularán, en orden.
+        """
+        return [nombre for nombre, _, _ in self.nodos.values()]
+
+    def _recorrer_celdas(self, valores, conteos, num_filas, num_columnas, alto_cuadricula, ancho_cuadricula):
+        pixeles_celda = alto_cuadricula * ancho_cuadricula
+        for fila in range(num_filas):
+            for columna in range(num_columnas):
+                y_inicio = fila * alto_cuadricula
+                x_inicio = columna * ancho_cuadricula
+                celda = {}
+                for clave, (nombre, entrada, p) in self.nodos.items():
+                    if clave not in self.por_celda:
+                        continue
+                    if entrada not in celda:
+                        celda[entrada] = np.ascontiguousarray(
+                            valores[entrada][y_inicio:y_inicio + alto_cuadricula,
+                                             x_inicio:x_inicio + ancho_cuadricula])
+                    with etapa(nombre, pixeles_celda):
+                        celda[clave] = INTERMEDIOS[nombre][2](celda[entrada], p)
+                for tipo, clave, p in self.analisis:
+                    if clave in self.por_celda:
+                        conteos[tipo][fila, columna] = cv2.countNonZero(ANALISIS[tipo][1](celda[clave], p))
+
+    def _fusionados(self):
+        if not self.fusionado:
+            return set()
+        # numba solo se importa cuando se pide el núcleo fusionado
+        from cobertura.fusionado import NUMBA_DISPONIBLE, TIPOS_FUSIONABLES
+
+        if not NUMBA_DISPONIBLE:
+            return set()
+        return {tipo for tipo, clave, _ in self.analisis if tipo in TIPOS_FUSIONABLES and clave not in self.por_celda}
+
+    def ejecutar(self, imagen, num_filas, num_columnas):
+        """
+        Recorre la imagen una sola vez y devuelve un diccionario tipo -> matriz de resultados.
+        """
+        alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+        valores = {("bgr",): imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]}
+        pixeles = num_filas * alto_cuadricula * num_columnas * ancho_cuadricula
+
+        conteos = {}
+        fusionados = self._fusionados() if imagen.ndim == 3 else set()
+        if fusionados:
+            from cobertura.fusionado import contar_tipos
+
+            conteos.update(contar_tipos(valores[("bgr",)], num_filas, num_columnas,
+                                        [(tipo, p) for tipo, _, p in self.analisis if tipo in fusionados]))
+
+        # Intermedios píxel a píxel: una sola vez sobre toda la imagen, salvo los que solo
+        # alimentaban a análisis ya contados por el núcleo fusionado
+        necesarios = {entrada for clave, (_, entrada, _) in self.nodos.items() if clave in self.por_celda}
+        necesarios.update(clave for tipo, clave, _ in self.analisis if tipo not in fusionados)
+        for clave, (nombre, entrada, p) in self.nodos.items():
+            if clave not in self.por_celda and clave in necesarios:
+                with etapa(nombre, pixeles):
+                    valores[clave] = INTERMEDIOS[nombre][2](valores[entrada], p)
+
+        for tipo, clave, p in self.analisis:
+            if tipo in fusionados:
+                continue
+            if clave not in self.por_celda:
+                with etapa(f"mascara_{tipo}", pixeles):
+                    mascara = ANALISIS[tipo][1](valores[clave], p)
+                conteos[tipo] = contar_por_celda(mascara, num_filas, num_columnas)
+            else:
+                conteos[tipo] = np.zeros((num_filas, num_columnas), dtype=int)
+
+        # Intermedios por celda: un único recorrido de las cuadrículas para todos los análisis
+        if self.por_celda:
+            with etapa("bucle_celdas", pixeles):
+                self._recorrer_celdas(valores, conteos, num_filas, num_columnas, alto_cuadricula, ancho_cuadricula)
+
+        pixeles_totales = alto_cuadricula * ancho_cuadricula
+        return {tipo: cuantizar_cobertura(conteos[tipo], pixeles_totales, p["umbral"])
+                for tipo, _, p in self.analisis}
+
+@con_cache
+def analizar_multiple(imagen, num_filas, num_columnas, tipos=("vegetal", "urbanistico", "vial"), parametros=None,
+                      fusionado=False):
+    """
+    Realiza varios análisis en una sola pasada compartiendo las conversiones comunes.
+    parametros es un diccionario opcional tipo -> parámetros que reemplazan a los por defecto.
+    Con fusionado=True se usa el núcleo compilado con numba para los análisis píxel a píxel.
+    """
+    return Plan(tipos, parametros, fusionado).ejecutar(imagen, num_filas, num_columnas)
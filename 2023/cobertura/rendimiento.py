@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from cobertura.fusionado import verificar_nucleo
+from cobertura.piramide import analizar_cuadriculas_piramide
+from cobertura.planificador import analizar_multiple
+from cobertura.vectorizado import analizar_cuadriculas_vectorizado
+from cobertura.vial import (
+    analizar_cuadriculas_vial,
+    analizar_cuadriculas_vial_global,
+    analizar_cuadriculas_vial_gris,
+    analizar_cuadriculas_vial_gris_global,
+    recortar_segmentos_en_cuadricula,
+)
+
+# Colores BGR de la escena sintética, elegidos dentro de los rangos por defecto de cada análisis
+COLOR_SUELO = (60, 90, 120)      # marrón: ni verde, ni gris, ni más claro que umbral_gris
+COLOR_VEGETACION = (40, 140, 50)
+COLOR_VIA = (128, 128, 128)      # dentro de gris_bajo-gris_alto de VIASDEF2
+COLOR_MANZANA = (210, 215, 225)  # techos claros: urbanístico (gris > 100)
+
+def generar_escena(alto, ancho, semilla=0, parches=40, vias=12, manzanas=60):
+    """
+    Genera una escena sintética determinista: suelo, parches de vegetación, manzanas urbanas y
+    una red de vías grises. La disposición depende solo de la semilla, no de la resolución,
+    así que las escenas de distintos tamaños son la misma escena escalada.
+    Devuelve la imagen BGR y un diccionario con la longitud total de las vías en píxeles y
+    sus segmentos (x1, y1, x2, y2), que sirven de referencia para los análisis viales.
+    """
+    generador = np.random.default_rng(semilla)
+    imagen = np.empty((alto, ancho, 3), dtype=np.uint8)
+    imagen[:] = COLOR_SUELO
+    escala = min(alto, ancho)
+
+    for _ in range(parches):
+        centro = (int(generador.uniform(0, ancho)), int(generador.uniform(0, alto)))
+        ejes = (int(generador.uniform(0.02, 0.12) * escala), int(generador.uniform(0.02, 0.12) * escala))
+        cv2.ellipse(imagen, centro, ejes, generador.uniform(0, 180), 0, 360, COLOR_VEGETACION, -1)
+
+    for _ in range(manzanas):
+        x, y = int(generador.uniform(0, ancho)), int(generador.uniform(0, alto))
+        lado_x, lado_y = (int(generador.uniform(0.02, 0.06) * escala) for _ in range(2))
+        cv2.rectangle(imagen, (x, y), (x + lado_x, y + lado_y), COLOR_MANZANA, -1)
+
+    grosor = max(2, int(0.008 * escala))
+    longitud_vias = 0.0
+    segmentos_vias = []
+    for indice in range(vias):
+        # Vías horizontales y verticales alternadas con algo de inclinación
+        if indice % 2 == 0:
+            y1, y2 = generador.uniform(0, alto, 2)
+            extremos = (0, y1, ancho - 1, y2)
+        else:
+            x1, x2 = generador.uniform(0, ancho, 2)
+            extremos = (x1, 0, x2, alto - 1)
+        x1, y1, x2, y2 = (int(valor) for valor in extremos)
+        cv2.line(imagen, (x1, y1), (x2, y2), COLOR_VIA, grosor)
+        longitud_vias += float(np.hypot(x2 - x1, y2 - y1))
+        segmentos_vias.append((x1, y1, x2, y2))
+
+    return imagen, {"longitud_vias": longitud_vias, "grosor_vias": grosor, "segmentos_vias": segmentos_vias}
+
+def tamano_por_megapixeles(megapixeles, proporcion=4 / 3):
+    """
+    Alto y ancho de una imagen de los megapíxeles indicados (ancho / alto = proporcion).
+    """
+    alto = int(round((megapixeles * 1e6 / proporcion) ** 0.5))
+    return alto, int(round(alto * proporcion))
+
+UMBRAL_LONGITUD = 50
+
+# Analizadores que se miden: nombre -> función(imagen, num_filas, num_columnas)
+ANALIZADORES = {
+    "vegetal": lambda imagen, nf, nc: analizar_cuadriculas_vectorizado(imagen, nf, nc, "vegetal"),
+    "urbanistico": lambda imagen, nf, nc: analizar_cuadriculas_vectorizado(imagen, nf, nc, "urbanistico"),
+    "vial_bordes": lambda imagen, nf, nc: analizar_cuadriculas_vectorizado(imagen, nf, nc, "vial"),
+    "multiple": lambda imagen, nf, nc: analizar_multiple(imagen, nf, nc),
+    "multiple_fusionado": lambda imagen, nf, nc: analizar_multiple(imagen, nf, nc, fusionado=True),
+    "piramide_vegetal": lambda imagen, nf, nc: analizar_cuadriculas_piramide(imagen, nf, nc, "vegetal"),
+    "vial_hough": lambda imagen, nf, nc: analizar_cuadriculas_vial(imagen, nf, nc, UMBRAL_LONGITUD),
+    "vial_gris": lambda imagen, nf, nc: analizar_cuadriculas_vial_gris(imagen, nf, nc, UMBRAL_LONGITUD),
+    "vial_global": lambda imagen, nf, nc: analizar_cuadriculas_vial_global(imagen, nf, nc, UMBRAL_LONGITUD),
+    "vial_gris_global": lambda imagen, nf, nc: analizar_cuadriculas_vial_gris_global(imagen, nf, nc,
+                                                                                      UMBRAL_LONGITUD),
+}
+
+# Analizadores que miden longitud de vías y se comparan con las vías conocidas de la escena
+ANALIZADORES_VIALES = ("vial_hough", "vial_gris", "vial_global", "vial_gris_global")
+
+# Etapas individuales sobre la imagen completa: nombre -> función(entrada)
+ETAPAS = {
+    "bgr_a_hsv": lambda imagen: cv2.cvtColor(imagen, cv2.COLOR_BGR2HSV),
+    "bgr_a_gris": lambda imagen: cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY),
+    "in_range": lambda hsv: cv2.inRange(hsv, np.array((30, 20, 10)), np.array((90, 255, 255))),
+    "canny": lambda gris: cv2.Canny(gris, 30, 200),
+    "hough": lambda bordes: cv2.HoughLinesP(bordes, 1, np.pi / 180, threshold=30, minLineLength=50, maxLineGap=20),
+}
+
+# Entrada de cada etapa, preparada a partir de la imagen BGR fuera de la medición
+ENTRADAS_ETAPAS = {
+    "in_range": lambda imagen: cv2.cvtColor(imagen, cv2.COLOR_BGR2HSV),
+    "canny": lambda imagen: cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY),
+    "hough": lambda imagen: cv2.Canny(cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY), 30, 200),
+}
+
+def longitud_vias_por_celda(segmentos, alto, ancho, num_filas, num_columnas):
+    """
+    Longitud en píxeles del eje de las vías conocidas dentro de cada cuadrícula.
+    """
+    alto_cuadricula, ancho_cuadricula = alto // num_filas, ancho // num_columnas
+    _, fila, columna, longitud = recortar_segmentos_en_cuadricula(segmentos, alto_cuadricula, ancho_cuadricula,
+                                                                   num_filas, num_columnas)
+    return np.bincount(fila * num_columnas + columna, weights=longitud,
+                       minlength=num_filas * num_columnas).reshape(num_filas, num_columnas)
+
+def verificar_vial(matriz, longitudes, umbral_longitud=UMBRAL_LONGITUD):
+    """
+    Compara la matriz de un análisis vial con la longitud conocida de las vías por cuadrícula:
+    aciertos es la fracción de cuadrículas con al menos umbral_longitud de vía que el análisis
+    marca al 100%, y falsos la fracción de cuadrículas sin vía en las que detecta algo.
+    """
+    con_via, sin_via = longitudes >= umbral_longitud, longitudes == 0
+    return {
+        "aciertos": float(np.mean(matriz[con_via] == 100)) if con_via.any() else None,
+        "falsos": float(np.mean(matriz[sin_via] > 0)) if sin_via.any() else None,
+    }
+
+def medir(funcion, repeticiones=3):
+    """
+    Ejecuta la función varias veces y devuelve los tiempos en segundos (mínimo, mediana y todos).
+    Una primera ejecución sin medir deja fuera la inicialización (por ejemplo, cargar el núcleo de numba).
+    """
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {"minimo": min(tiempos), "mediana": statistics.median(tiempos), "tiempos": tiempos}
+
+def entorno():
+    """
+    Versiones y máquina en las que se ejecutó la medición, para comparar ejecuciones.
+    """
+    return {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "hilos_opencv": cv2.getNumThreads(),
+    }
+
+def ejecutar_suite(megapixeles=(1, 4, 16), cuadriculas=((30, 15), (60, 30)), analizadores=None, etapas=None,
+                   repeticiones=3, semilla=0, progreso=None):
+    """
+    Mide cada analizador y cada etapa en escenas sintéticas de cada resolución y cuadrícula.
+    Devuelve un diccionario con el entorno y una lista de mediciones.
+    progreso, si se indica, recibe cada medición en cuanto termina.
+    Las mediciones de los análisis viales incluyen aciertos y falsos frente a las vías
+    conocidas de la escena (ver verificar_vial).
+    """
+    analizadores = list(ANALIZADORES) if analizadores is None else analizadores
+    etapas = list(ETAPAS) if etapas is None else etapas
+    mediciones = []
+
+    def registrar(medicion):
+        mediciones.append(medicion)
+        if progreso is not None:
+            progreso(medicion)
+
+    for mp in megapixeles:
+        alto, ancho = tamano_por_megapixeles(mp)
+        imagen, escena = generar_escena(alto, ancho, semilla)
+        segmentos = escena.pop("segmentos_vias")
+        base = {"megapixeles": mp, "alto": alto, "ancho": ancho, "semilla": semilla, **escena}
+
+        for nombre in etapas:
+            entrada = ENTRADAS_ETAPAS[nombre](imagen) if nombre in ENTRADAS_ETAPAS else imagen
+            registrar({**base, "tipo": "etapa", "nombre": nombre,
+                       **medir(lambda: ETAPAS[nombre](entrada), repeticiones)})
+        for num_filas, num_columnas in cuadriculas:
+            longitudes = longitud_vias_por_celda(segmentos, alto, ancho, num_filas, num_columnas)
+            for nombre in analizadores:
+                salida = {}
+
+                def analizar():
+                    salida["matriz"] = ANALIZADORES[nombre](imagen, num_filas, num_columnas)
+
+                medicion = {**base, "tipo": "analizador", "nombre": nombre, "num_filas": num_filas,
+                            "num_columnas": num_columnas, **medir(analizar, repeticiones)}
+                if nombre in ANALIZADORES_VIALES:
+                    medicion.update(verificar_vial(salida["matriz"], longitudes))
+                registrar(medicion)
+        del imagen
+
+    return {"entorno": entorno(), "mediciones": mediciones}
+
+def _clave(medicion):
+    return (medicion["tipo"], medicion["nombre"], medicion["megapixeles"], medicion.get("num_filas"),
+            medicion.get("num_columnas"))
+
+def comparar(anterior, actual):
+    """
+    Compara dos ejecuciones (diccionarios de ejecutar_suite o rutas a sus JSON).
+    Devuelve una lista (medición, tiempo anterior, tiempo actual, cociente) con las medianas.
+    """
+    ejecuciones = []
+    for ejecucion in (anterior, actual):
+        if isinstance(ejecucion, str):
+            with open(ejecucion, encoding="utf-8") as archivo:
+                ejecucion = json.load(archivo)
+        ejecuciones.append({_clave(m): m["mediana"] for m in ejecucion["mediciones"]})
+    tiempos_anteriores, tiempos_actuales = ejecuciones
+    return [(clave, tiempos_anteriores[clave], tiempo, tiempo / tiempos_anteriores[clave])
+            for clave, tiempo in tiempos_actuales.items() if clave in tiempos_anteriores]
+
+def _describir(medicion):
+    cuadricula = f" {medicion['num_filas']}x{medicion['num_columnas']}" if "num_filas" in medicion else ""
+    return f"{medicion['nombre']:<18} {medicion['megapixeles']:>6} MP{cuadricula:<8}"
+
+def _informar(medicion):
+    linea = f"{_describir(medicion)} {medicion['mediana'] * 1000:10.1f} ms"
+    if medicion.get("aciertos") is not None:
+        linea += f"  aciertos {medicion['aciertos']:.0%}"
+    if medicion.get("falsos") is not None:
+        linea += f"  falsos {medicion['falsos']:.0%}"
+    print(linea)
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de los análisis con escenas sintéticas.")
+    parser.add_argument("--megapixeles", type=float, nargs="+", default=[1, 4, 16],
+                        help="Resoluciones a medir (por ejemplo 1 4 16 100)")
+    parser.add_argument("--cuadriculas", nargs="+", default=["30x15", "60x30"], help="Cuadrículas FILASxCOLUMNAS")
+    parser.add_argument("--analizadores", default=",".join(ANALIZADORES),
+                        help=f"Lista separada por comas: {', '.join(ANALIZADORES)}")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help=f"Lista separada por comas: {', '.join(ETAPAS)}")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="rendimiento.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Antes de medir, comprueba que el núcleo numba coincide con OpenCV en todos los colores")
+    args = parser.parse_args(argumentos)
+
+    analizadores = [nombre.strip() for nombre in args.analizadores.split(",") if nombre.strip()]
+    etapas = [nombre.strip() for nombre in args.etapas.split(",") if nombre.strip()]
+    desconocidos = [n for n in analizadores if n not in ANALIZADORES] + [n for n in etapas if n not in ETAPAS]
+    if desconocidos:
+        parser.error(f"Analizadores o etapas no reconocidos: {', '.join(desconocidos)}")
+    try:
+        cuadriculas = [tuple(int(valor) for valor in texto.lower().split("x")) for texto in args.cuadriculas]
+    except ValueError:
+        parser.error("Las cuadrículas deben tener la forma FILASxCOLUMNAS, por ejemplo 30x15.")
+
+    if args.verificar:
+        diferencias = verificar_nucleo()
+        if diferencias is None:
+            print("Verificación del núcleo omitida: numba no está instalado.")
+        elif diferencias:
+            print(f"El núcleo numba difiere de OpenCV en {diferencias} píxeles y reglas.")
+            return 1
+        else:
+            print("El núcleo numba coincide con OpenCV en todos los colores.")
+
+    resultado = ejecutar_suite(args.megapixeles, cuadriculas, analizadores, etapas, args.repeticiones, args.semilla,
+                               progreso=_informar)
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultado, archivo, indent=2)
+    print(f"Resultados en {args.salida}.")
+
+    if args.comparar:
+        for (tipo, nombre, mp, nf, nc), anterior, actual, cociente in comparar(args.comparar, resultado):
+            cuadricula = f" {nf}x{nc}" if nf else ""
+            print(f"{nombre:<18} {mp:>6} MP{cuadricula:<8} {anterior * 1000:10.1f} -> {actual * 1000:10.1f} ms "
+                  f"(x{cociente:.2f})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
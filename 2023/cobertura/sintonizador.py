@@ -0,0 +1,141 @@
+import cv2
+import numpy as np
+
+from cobertura.vectorizado import PARAMETROS, analizar_cuadriculas_vectorizado, cuantizar_cobertura
+
+# Colores de la vista previa según la cobertura de la cuadrícula (BGR)
+COLORES_COBERTURA = {0: (0, 0, 0), 25: (0, 255, 255), 50: (0, 200, 255), 75: (0, 128, 255), 100: (0, 0, 255)}
+
+def construir_piramide(imagen, lado_max=800):
+    """
+    Reduce la imagen con pyrDown hasta que su lado mayor no supere lado_max.
+    Devuelve la lista de niveles, desde la imagen original hasta la más pequeña.
+    """
+    niveles = [imagen]
+    while max(niveles[-1].shape[:2]) > lado_max:
+        niveles.append(cv2.pyrDown(niveles[-1]))
+    return niveles
+
+def cobertura_aproximada(mascara, num_filas, num_columnas, umbral_porcentaje):
+    """
+    Cobertura de cada cuadrícula sobre una máscara reducida: INTER_AREA promedia los píxeles
+    de cada celda, así que no hace falta que el tamaño reducido sea múltiplo de la cuadrícula.
+    """
+    fraccion = cv2.resize(mascara.astype(np.float32) / 255, (num_columnas, num_filas), interpolation=cv2.INTER_AREA)
+    return cuantizar_cobertura(fraccion * 100, 100, umbral_porcentaje)
+
+class SintonizadorHSV:
+    """
+    Ajuste interactivo del rango HSV y del umbral de cobertura vegetal.
+    La vista previa (máscara y cobertura por cuadrícula) se calcula sobre un nivel reducido de la
+    pirámide y solo se vuelve a dibujar cuando cambia algún control. Al confirmar (Enter o 'c')
+    se recalcula la cobertura a resolución completa; Esc cancela.
+    Un clic sobre la imagen muestra el HSV del píxel, como colorimetria.py.
+    """
+
+    CONTROLES = (("H bajo", 179), ("S bajo", 255), ("V bajo", 255),
+                 ("H alto", 179), ("S alto", 255), ("V alto", 255), ("Umbral %", 100))
+
+    def __init__(self, imagen, num_filas=30, num_columnas=15, verde_bajo=None, verde_alto=None, umbral=None,
+                 lado_max=800, ventana="Sintonizador HSV"):
+        p = PARAMETROS["vegetal"]
+        self.imagen = imagen
+        self.num_filas = num_filas
+        self.num_columnas = num_columnas
+        self.ventana = ventana
+        self.valores = list(verde_bajo or p["verde_bajo"]) + list(verde_alto or p["verde_alto"]) \
+            + [p["umbral"] if umbral is None else umbral]
+
+        reducida = construir_piramide(imagen, lado_max)[-1]
+        self.escala = imagen.shape[1] / reducida.shape[1]
+        # Igual que en el análisis completo, se ignoran los píxeles que sobran de la cuadrícula
+        alto_util = imagen.shape[0] // num_filas * num_filas
+        ancho_util = imagen.shape[1] // num_columnas * num_columnas
+        self.reducida = reducida[:round(alto_util / self.escala), :round(ancho_util / self.escala)]
+        # La conversión a HSV de la vista previa se hace una sola vez
+        self.hsv_reducida = cv2.cvtColor(self.reducida, cv2.COLOR_BGR2HSV)
+        self.hsv_completa = None
+        self._cambiado = True
+
+    @property
+    def verde_bajo(self):
+        return tuple(self.valores[0:3])
+
+    @property
+    def verde_alto(self):
+        return tuple(self.valores[3:6])
+
+    @property
+    def umbral(self):
+        return self.valores[6]
+
+    def _al_mover(self, indice):
+        def actualizar(valor):
+            if self.valores[indice] != valor:
+                self.valores[indice] = valor
+                self._cambiado = True
+        return actualizar
+
+    def _al_hacer_clic(self, evento, x, y, flags, param):
+        if evento == cv2.EVENT_LBUTTONDOWN:
+            if self.hsv_completa is None:
+                self.hsv_completa = cv2.cvtColor(self.imagen, cv2.COLOR_BGR2HSV)
+            x_img = min(int(x * self.escala), self.imagen.shape[1] - 1)
+            y_img = min(int(y * self.escala), self.imagen.shape[0] - 1)
+            print(f"Pixel seleccionado en (x={x_img}, y={y_img}): HSV = {self.hsv_completa[y_img, x_img]}")
+
+    def vista_previa(self):
+        """
+        Devuelve la imagen de la vista previa y la matriz de cobertura aproximada.
+        """
+        mascara = cv2.inRange(self.hsv_reducida, np.array(self.verde_bajo), np.array(self.verde_alto))
+        resultados = cobertura_aproximada(mascara, self.num_filas, self.num_columnas, self.umbral)
+
+        # Imagen atenuada fuera de la máscara y cuadrículas coloreadas según su cobertura
+        salida = cv2.convertScaleAbs(self.reducida, alpha=0.35)
+        cv2.copyTo(self.reducida, mascara, salida)
+        alto, ancho = salida.shape[:2]
+        colores = np.array([COLORES_COBERTURA[valor] for valor in resultados.ravel()], dtype=np.uint8)
+        capa = cv2.resize(colores.reshape(self.num_filas, self.num_columnas, 3), (ancho, alto),
+                          interpolation=cv2.INTER_NEAREST)
+        salida = cv2.addWeighted(salida, 0.7, capa, 0.3, 0)
+        for fila in range(1, self.num_filas):
+            y = fila * alto // self.num_filas
+            cv2.line(salida, (0, y), (ancho, y), (255, 255, 255), 1)
+        for columna in range(1, self.num_columnas):
+            x = columna * ancho // self.num_columnas
+            cv2.line(salida, (x, 0), (x, alto), (255, 255, 255), 1)
+        return salida, resultados
+
+    def calcular_completa(self):
+        """
+        Cobertura a resolución completa con los valores actuales, igual que analizar_cuadriculas.
+        """
+        return analizar_cuadriculas_vectorizado(self.imagen, self.num_filas, self.num_columnas, "vegetal",
+                                                verde_bajo=self.verde_bajo, verde_alto=self.verde_alto,
+                                                umbral=self.umbral)
+
+    def ejecutar(self):
+        """
+        Abre la ventana y espera a que el usuario confirme o cancele.
+        Devuelve un diccionario con verde_bajo, verde_alto, umbral y resultados, o None si se cancela.
+        """
+        cv2.namedWindow(self.ventana)
+        for indice, (nombre, maximo) in enumerate(self.CONTROLES):
+            cv2.createTrackbar(nombre, self.ventana, self.valores[indice], maximo, self._al_mover(indice))
+        cv2.setMouseCallback(self.ventana, self._al_hacer_clic)
+
+        try:
+            while True:
+                if self._cambiado:
+                    self._cambiado = False
+                    cv2.imshow(self.ventana, self.vista_previa()[0])
+                # Sin cambios solo se atienden los eventos de la ventana, no se vuelve a dibujar
+                tecla = cv2.waitKey(30) & 0xFF
+                if tecla == 27:
+                    return None
+                if tecla in (13, 10, ord("c")):
+                    return {"verde_bajo": self.verde_bajo, "verde_alto": self.verde_alto, "umbral": self.umbral,
+                            "resultados": self.calcular_completa()}
+        finally:
+            cv2.destroyWindow(self.ventana)
@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+from cobertura.cache import con_cache
+from cobertura.clasificador_lut import mascara_hsv
+from cobertura.instrumentacion import etapa
+
+# Parámetros por defecto de cada tipo de análisis (los mismos de 375.py)
+PARAMETROS = {
+    "vegetal": {"verde_bajo": (30, 20, 10), "verde_alto": (90, 255, 255), "umbral": 30},
+    "urbanistico": {"umbral_gris": 100, "umbral": 30},
+    "vial": {"canny_bajo": 50, "canny_alto": 150, "umbral": 20},
+}
+
+def parametros_de(tipo, **parametros):
+    """
+    Devuelve los parámetros por defecto del tipo, reemplazando los indicados.
+    """
+    if tipo not in PARAMETROS:
+        raise ValueError("Tipo no reconocido. Debe ser 'vegetal', 'urbanistico' o 'vial'.")
+    desconocidos = set(parametros) - set(PARAMETROS[tipo])
+    if desconocidos:
+        raise ValueError(f"Parámetros no válidos para '{tipo}': {sorted(desconocidos)}")
+    return {**PARAMETROS[tipo], **parametros}
+
+def tamano_cuadricula(imagen, num_filas, num_columnas):
+    """
+    Calcula el alto y ancho de cada cuadrícula igual que los scripts originales.
+    """
+    alto_img, ancho_img = imagen.shape[:2]
+    return alto_img // num_filas, ancho_img // num_columnas
+
+def a_gris(imagen):
+    """
+    Convierte a gris una imagen BGR; una imagen ya cargada en gris se devuelve sin cambios.
+    """
+    return imagen if imagen.ndim == 2 else cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+
+def mascara_imagen(imagen, num_filas, num_columnas, tipo="vegetal", usar_lut=False, **parametros):
+    """
+    Calcula la máscara binaria del tipo indicado para toda la zona cubierta por la cuadrícula.
+    Las conversiones de color se hacen una sola vez sobre la imagen completa.
+    Con usar_lut la máscara vegetal se obtiene de la tabla de colores precalculada (ClasificadorLUT).
+    """
+    p = parametros_de(tipo, **parametros)
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+
+    pixeles = zona.shape[0] * zona.shape[1]
+    if tipo == "vegetal":
+        return mascara_hsv(zona, p["verde_bajo"], p["verde_alto"], usar_lut)
+    if tipo == "urbanistico":
+        with etapa("bgr_a_gris", pixeles):
+            gris = a_gris(zona)
+        with etapa("umbral_gris", pixeles):
+            _, mascara = cv2.threshold(gris, p["umbral_gris"], 255, cv2.THRESH_BINARY)
+        return mascara
+
+    # Canny y la dilatación dependen de los bordes de cada cuadrícula, por eso
+    # se aplican celda a celda sobre la imagen en gris ya convertida.
+    with etapa("bgr_a_gris", pixeles):
+        gris = a_gris(zona)
+    mascara = np.empty_like(gris)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    with etapa("bucle_celdas", pixeles):
+        for y in range(0, gris.shape[0], alto_cuadricula):
+            for x in range(0, gris.shape[1], ancho_cuadricula):
+                celda = np.ascontiguousarray(gris[y:y + alto_cuadricula, x:x + ancho_cuadricula])
+                with etapa("canny", celda.size):
+                    bordes = cv2.Canny(celda, p["canny_bajo"], p["canny_alto"])
+                with etapa("dilatacion", celda.size):
+                    mascara[y:y + alto_cuadricula, x:x + ancho_cuadricula] = cv2.dilate(bordes, kernel, iterations=1)
+    return mascara
+
+def contar_por_celda(mascara, num_filas, num_columnas):
+    """
+    Cuenta los píxeles distintos de cero de cada cuadrícula con un solo reshape.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(mascara, num_filas, num_columnas)
+    zona = mascara[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    bloques = zona.reshape(num_filas, alto_cuadricula, num_columnas, ancho_cuadricula)
+    with etapa("contar_por_celda", zona.shape[0] * zona.shape[1]):
+        return np.count_nonzero(bloques, axis=(1, 3))
+
+def cuantizar_cobertura(pixeles_detectados, pixeles_totales, umbral_porcentaje):
+    """
+    Aplica a toda la matriz las reglas de calcular_cobertura_por_cuadrante:
+    0 si no se alcanza el umbral y 25, 50, 75 o 100% en otro caso.
+    """
+    porcentajes = (np.asarray(pixeles_detectados) / pixeles_totales) * 100
+    niveles = np.select(
+        [porcentajes <= 12.5, porcentajes <= 37.5, porcentajes <= 62.5], [25, 50, 75], default=100
+    )
+    return np.where(porcentajes >= umbral_porcentaje, niveles, 0).astype(int)
+
+@con_cache
+def analizar_cuadriculas_vectorizado(imagen, num_filas, num_columnas, tipo="vegetal", usar_lut=False, **parametros):
+    """
+    Equivalente a analizar_cuadriculas: convierte y enmascara la imagen una sola vez
+    y reduce la máscara por cuadrícula. El resultado coincide con el cálculo celda a celda.
+    """
+    p = parametros_de(tipo, **parametros)
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    mascara = mascara_imagen(imagen, num_filas, num_columnas, tipo, usar_lut, **parametros)
+    detectados = contar_por_celda(mascara, num_filas, num_columnas)
+    return cuantizar_cobertura(detectados, alto_cuadricula * ancho_cuadricula, p["umbral"])
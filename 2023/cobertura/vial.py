@@ -0,0 +1,298 @@
+import functools
+import os
+
+import cv2
+import numpy as np
+
+from cobertura.cache import con_cache
+from cobertura.clasificador_lut import mascara_hsv
+from cobertura.instrumentacion import etapa
+from cobertura.vectorizado import a_gris, tamano_cuadricula
+
+def cuantizar_longitud(longitud_total, umbral_longitud):
+    """
+    Convierte la longitud detectada en 0, 25, 50, 75 o 100% según el umbral de longitud.
+    Acepta un escalar o una matriz completa.
+    """
+    longitud_total = np.asarray(longitud_total)
+    return np.select(
+        [longitud_total >= umbral_longitud, longitud_total >= 0.75 * umbral_longitud,
+         longitud_total >= 0.5 * umbral_longitud, longitud_total >= 0.25 * umbral_longitud],
+        [100, 75, 50, 25], default=0
+    ).astype(int)
+
+def visualizar_detecciones(bordes, lineas):
+    """
+    Devuelve una imagen con los bordes y las líneas detectadas sobre la cuadrícula.
+    """
+    salida = cv2.cvtColor(bordes, cv2.COLOR_GRAY2BGR)
+    if lineas is not None:
+        cv2.polylines(salida, list(lineas.reshape(-1, 2, 2)), False, (0, 0, 255), 2)
+    return salida
+
+def _emitir_diagnostico(diagnostico, nombre_archivo, imagen):
+    # diagnostico puede ser True (un archivo por cuadrícula, como en los scripts) o una
+    # función que recibe la imagen (ver EscritorDiagnostico y AtlasDiagnostico)
+    if callable(diagnostico):
+        with etapa("diagnostico_encolar", imagen.shape[0] * imagen.shape[1]):
+            diagnostico(imagen)
+    elif diagnostico and nombre_archivo:
+        with etapa("diagnostico_imwrite", imagen.shape[0] * imagen.shape[1]) as medicion:
+            cv2.imwrite(nombre_archivo, imagen)
+            if medicion:
+                medicion.agregar(bytes_escritos=os.path.getsize(nombre_archivo))
+
+def calcular_cobertura_vial(cuadricula, umbral_longitud, diagnostico=False, nombre_archivo="", imagen_lineas=None,
+                            x_offset=0, y_offset=0, capa=None):
+    """
+    Calcula la cobertura vial en una cuadrícula utilizando la Transformada de Hough (ViasDEF.py).
+    Si se pasa una CapaVectorial, las líneas detectadas se agregan a ella.
+    """
+    pixeles = cuadricula.shape[0] * cuadricula.shape[1]
+    with etapa("bgr_a_gris", pixeles):
+        gris = a_gris(cuadricula)
+    with etapa("canny", pixeles):
+        bordes = cv2.Canny(gris, 30, 200)
+    with etapa("hough", pixeles):
+        lineas = cv2.HoughLinesP(bordes, 1, np.pi / 180, threshold=30, minLineLength=50, maxLineGap=20)
+    longitud_total = 0
+
+    if lineas is not None:
+        for x1, y1, x2, y2 in lineas.reshape(-1, 4):
+            longitud_total += np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            if imagen_lineas is not None:
+                cv2.line(imagen_lineas, (x1 + x_offset, y1 + y_offset), (x2 + x_offset, y2 + y_offset), (0, 0, 255), 2)
+
+    if capa is not None and lineas is not None:
+        capa.agregar_segmentos(lineas, x_offset, y_offset)
+
+    if diagnostico:
+        _emitir_diagnostico(diagnostico, nombre_archivo, visualizar_detecciones(bordes, lineas))
+
+    return int(cuantizar_longitud(longitud_total, umbral_longitud))
+
+def calcular_cobertura_vial_gris(cuadricula, umbral_longitud, diagnostico=False, nombre_archivo="", imagen_lineas=None,
+                                 x_offset=0, y_offset=0, gris_bajo=(0, 0, 50), gris_alto=(180, 50, 220), suavizar=False,
+                                 capa=None, usar_lut=False):
+    """
+    Calcula la cobertura vial en una cuadrícula detectando áreas grises y contornos.
+    Si se pasa una CapaVectorial, los contornos contados se agregan a ella.
+    Los valores por defecto son los de VIASDEF2.py; 2VIALDEF.py usa gris_bajo=(0, 0, 85),
+    gris_alto=(180, 30, 250) y suavizar=True. Con usar_lut la máscara gris sale de la tabla
+    de colores precalculada en lugar de cvtColor + inRange.
+    """
+    pixeles = cuadricula.shape[0] * cuadricula.shape[1]
+    mascara_gris = mascara_hsv(cuadricula, gris_bajo, gris_alto, usar_lut)
+    if suavizar:
+        with etapa("suavizado", pixeles):
+            mascara_gris = cv2.GaussianBlur(mascara_gris, (5, 5), 0)
+
+    with etapa("canny", pixeles):
+        bordes = cv2.Canny(mascara_gris, 50, 150)
+    with etapa("find_contours", pixeles):
+        contornos, _ = cv2.findContours(bordes, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    longitud_total = 0
+
+    largos = []
+    for contorno in contornos:
+        longitud = cv2.arcLength(contorno, closed=False)
+        if longitud > umbral_longitud:  # Considerar solo contornos suficientemente largos
+            longitud_total += longitud
+            largos.append(contorno)
+
+    if largos and imagen_lineas is not None:
+        cv2.drawContours(imagen_lineas, largos, -1, (0, 255, 0), 2, offset=(x_offset, y_offset))
+    if largos and capa is not None:
+        capa.agregar_polilineas(largos, x_offset, y_offset)
+
+    if diagnostico:
+        diagnostico_img = cv2.cvtColor(mascara_gris, cv2.COLOR_GRAY2BGR)
+        cv2.drawContours(diagnostico_img, contornos, -1, (0, 255, 0), 2)
+        _emitir_diagnostico(diagnostico, nombre_archivo, diagnostico_img)
+
+    return int(cuantizar_longitud(longitud_total, umbral_longitud))
+
+def _recorrer_cuadriculas(calcular, imagen, num_filas, num_columnas, umbral_longitud, diagnostico, imagen_lineas,
+                          fila_inicio=0, **parametros):
+    # fila_inicio es la fila de la cuadrícula completa en la que empieza la imagen (al analizar
+    # por franjas): numera los diagnósticos y desplaza las líneas a coordenadas de la imagen completa
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    matriz_resultados = np.zeros((num_filas, num_columnas), dtype=int)
+    y_franja = fila_inicio * alto_cuadricula
+
+    with etapa("bucle_celdas", num_filas * alto_cuadricula * num_columnas * ancho_cuadricula):
+        for fila in range(num_filas):
+            for columna in range(num_columnas):
+                y_inicio = fila * alto_cuadricula
+                x_inicio = columna * ancho_cuadricula
+                cuadricula = imagen[y_inicio:y_inicio + alto_cuadricula, x_inicio:x_inicio + ancho_cuadricula]
+
+                fila_imagen = fila_inicio + fila
+                if hasattr(diagnostico, "agregar"):
+                    diagnostico_celda = functools.partial(diagnostico.agregar, fila_imagen, columna)
+                    nombre_diagnostico = ""
+                else:
+                    diagnostico_celda = diagnostico
+                    nombre_diagnostico = f"diagnostico_cuadricula_{fila_imagen}_{columna}.jpg" if diagnostico else ""
+                matriz_resultados[fila, columna] = calcular(
+                    cuadricula, umbral_longitud, diagnostico_celda, nombre_diagnostico, imagen_lineas, x_inicio,
+                    y_franja + y_inicio, **parametros
+                )
+
+    return matriz_resultados
+
+@con_cache
+def analizar_cuadriculas_vial(imagen, num_filas, num_columnas, umbral_longitud, diagnostico=False, imagen_lineas=None,
+                              capa=None, fila_inicio=0):
+    """
+    Divide la imagen en cuadrículas y analiza la cobertura vial en cada cuadrícula.
+    Las líneas detectadas se dibujan en imagen_lineas o se agregan a capa (CapaVectorial), si se pasan.
+    diagnostico puede ser True (un JPEG por cuadrícula) o un EscritorDiagnostico/AtlasDiagnostico.
+    Si la imagen es una franja de otra mayor, fila_inicio es su primera fila de cuadrícula
+    (ver cobertura.franjas); imagen_lineas y capa están entonces en coordenadas de la imagen completa.
+    """
+    return _recorrer_cuadriculas(calcular_cobertura_vial, imagen, num_filas, num_columnas, umbral_longitud,
+                                 diagnostico, imagen_lineas, fila_inicio, capa=capa)
+
+@con_cache
+def analizar_cuadriculas_vial_gris(imagen, num_filas, num_columnas, umbral_longitud, diagnostico=False,
+                                   imagen_lineas=None, fila_inicio=0, **parametros):
+    """
+    Divide la imagen en cuadrículas y analiza la cobertura vial considerando solo tonalidades grises.
+    Los parámetros adicionales (gris_bajo, gris_alto, suavizar, capa, usar_lut) se pasan a
+    calcular_cobertura_vial_gris. fila_inicio se usa como en analizar_cuadriculas_vial.
+    """
+    return _recorrer_cuadriculas(calcular_cobertura_vial_gris, imagen, num_filas, num_columnas, umbral_longitud,
+                                 diagnostico, imagen_lineas, fila_inicio, **parametros)
+
+def recortar_segmentos_en_cuadricula(segmentos, alto_cuadricula, ancho_cuadricula, num_filas, num_columnas):
+    """
+    Divide cada segmento (x1, y1, x2, y2) en los tramos que caen dentro de cada cuadrícula.
+    Devuelve, para cada tramo, el índice del segmento, su fila, su columna y su longitud.
+    Los tramos fuera de la cuadrícula se descartan.
+    """
+    segmentos = np.asarray(segmentos, dtype=float).reshape(-1, 4)
+
+    # La mayoría de los segmentos (p. ej. de contornos) no cruzan ninguna línea de la
+    # cuadrícula: se asignan directamente y solo el resto pasa por el recorte general
+    fila_1 = np.floor(segmentos[:, 1] / alto_cuadricula)
+    columna_1 = np.floor(segmentos[:, 0] / ancho_cuadricula)
+    interiores = ((fila_1 == np.floor(segmentos[:, 3] / alto_cuadricula))
+                  & (columna_1 == np.floor(segmentos[:, 2] / ancho_cuadricula)))
+    directos = np.nonzero(interiores & (fila_1 >= 0) & (fila_1 < num_filas)
+                          & (columna_1 >= 0) & (columna_1 < num_columnas))[0]
+    cruzan = np.nonzero(~interiores)[0]
+    longitud_directos = np.hypot(segmentos[directos, 2] - segmentos[directos, 0],
+                                 segmentos[directos, 3] - segmentos[directos, 1])
+
+    x1, y1, x2, y2 = (segmentos[cruzan, i:i + 1] for i in range(4))
+    dx, dy = x2 - x1, y2 - y1
+    longitud = np.hypot(dx, dy)
+
+    # Valores del parámetro t (0 a 1) en los que cada segmento cruza las líneas de la cuadrícula
+    xs = np.arange(num_columnas + 1) * ancho_cuadricula
+    ys = np.arange(num_filas + 1) * alto_cuadricula
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cortes = np.concatenate(
+            [np.zeros_like(x1), (xs - x1) / dx, (ys - y1) / dy, np.ones_like(x1)], axis=1
+        )
+    cortes[~((cortes >= 0) & (cortes <= 1))] = np.nan
+    cortes.sort(axis=1)  # Los NaN quedan al final
+
+    t_inicio, t_fin = cortes[:, :-1], cortes[:, 1:]
+    t_medio = (t_inicio + t_fin) / 2
+    fila = np.floor((y1 + t_medio * dy) / alto_cuadricula)
+    columna = np.floor((x1 + t_medio * dx) / ancho_cuadricula)
+    valido = (t_fin > t_inicio) & (fila >= 0) & (fila < num_filas) & (columna >= 0) & (columna < num_columnas)
+
+    indice, tramo = np.nonzero(valido)
+    return (np.concatenate([directos, cruzan[indice]]),
+            np.concatenate([fila_1[directos], fila[indice, tramo]]).astype(int),
+            np.concatenate([columna_1[directos], columna[indice, tramo]]).astype(int),
+            np.concatenate([longitud_directos, ((t_fin - t_inicio) * longitud)[indice, tramo]]))
+
+@con_cache
+def analizar_cuadriculas_vial_global(imagen, num_filas, num_columnas, umbral_longitud, imagen_lineas=None, capa=None):
+    """
+    Variante de analizar_cuadriculas_vial que ejecuta Canny y Hough una sola vez sobre toda
+    la imagen y reparte la longitud de cada línea entre las cuadrículas que atraviesa.
+    Las calles que cruzan el borde de una cuadrícula ya no se fragmentan ni se pierden por
+    minLineLength, así que los resultados pueden ser mayores que los del análisis por celda.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+
+    pixeles = zona.shape[0] * zona.shape[1]
+    with etapa("bgr_a_gris", pixeles):
+        gris = a_gris(zona)
+    with etapa("canny", pixeles):
+        bordes = cv2.Canny(gris, 30, 200)
+    with etapa("hough", pixeles):
+        lineas = cv2.HoughLinesP(bordes, 1, np.pi / 180, threshold=30, minLineLength=50, maxLineGap=20)
+    lineas = np.zeros((0, 4), dtype=np.int32) if lineas is None else lineas.reshape(-1, 4)
+
+    with etapa("recorte_segmentos"):
+        _, fila, columna, longitud = recortar_segmentos_en_cuadricula(
+            lineas, alto_cuadricula, ancho_cuadricula, num_filas, num_columnas
+        )
+        longitudes = np.bincount(fila * num_columnas + columna, weights=longitud, minlength=num_filas * num_columnas)
+
+    if imagen_lineas is not None and len(lineas):
+        cv2.polylines(imagen_lineas, list(lineas.reshape(-1, 2, 2)), False, (0, 0, 255), 2)
+    if capa is not None:
+        capa.agregar_segmentos(lineas)
+
+    return cuantizar_longitud(longitudes.reshape(num_filas, num_columnas), umbral_longitud)
+
+@con_cache
+def analizar_cuadriculas_vial_gris_global(imagen, num_filas, num_columnas, umbral_longitud, imagen_lineas=None,
+                                          gris_bajo=(0, 0, 50), gris_alto=(180, 50, 220), suavizar=False, capa=None,
+                                          usar_lut=False):
+    """
+    Variante de analizar_cuadriculas_vial_gris que extrae los contornos una sola vez sobre toda
+    la imagen y reparte la longitud de cada contorno entre las cuadrículas que atraviesa.
+    El umbral de longitud se aplica a cada tramo de contorno dentro de una cuadrícula, como
+    en el análisis por celda, pero una carretera que cruza varias cuadrículas se mide igual
+    en todas ellas.
+    """
+    alto_cuadricula, ancho_cuadricula = tamano_cuadricula(imagen, num_filas, num_columnas)
+    zona = imagen[:num_filas * alto_cuadricula, :num_columnas * ancho_cuadricula]
+    num_celdas = num_filas * num_columnas
+
+    pixeles = zona.shape[0] * zona.shape[1]
+    mascara_gris = mascara_hsv(zona, gris_bajo, gris_alto, usar_lut)
+    if suavizar:
+        with etapa("suavizado", pixeles):
+            mascara_gris = cv2.GaussianBlur(mascara_gris, (5, 5), 0)
+    with etapa("canny", pixeles):
+        bordes = cv2.Canny(mascara_gris, 50, 150)
+    with etapa("find_contours", pixeles):
+        contornos, _ = cv2.findContours(bordes, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contornos:
+        return np.zeros((num_filas, num_columnas), dtype=int)
+
+    # Segmentos entre puntos consecutivos de cada contorno abierto (como arcLength(closed=False))
+    puntos = np.concatenate(contornos).reshape(-1, 2)
+    ids = np.repeat(np.arange(len(contornos)), [len(contorno) for contorno in contornos])
+    mismo = ids[:-1] == ids[1:]
+    segmentos = np.hstack([puntos[:-1][mismo], puntos[1:][mismo]])
+    contorno_de_segmento = ids[:-1][mismo]
+
+    with etapa("recorte_segmentos"):
+        indice, fila, columna, longitud = recortar_segmentos_en_cuadricula(
+            segmentos, alto_cuadricula, ancho_cuadricula, num_filas, num_columnas
+        )
+    # Longitud de cada tramo (contorno, cuadrícula) y umbral aplicado por tramo
+    claves, posicion = np.unique(contorno_de_segmento[indice] * num_celdas + fila * num_columnas + columna,
+                                 return_inverse=True)
+    longitud_tramo = np.bincount(posicion.ravel(), weights=longitud)
+    largos = longitud_tramo > umbral_longitud
+    longitudes = np.bincount(claves[largos] % num_celdas, weights=longitud_tramo[largos], minlength=num_celdas)
+
+    contados = [contornos[k] for k in np.unique(claves[largos] // num_celdas)]
+    if contados and imagen_lineas is not None:
+        cv2.drawContours(imagen_lineas, contados, -1, (0, 255, 0), 2)
+    if contados and capa is not None:
+        capa.agregar_polilineas(contados)
+
+    return cuantizar_longitud(longitudes.reshape(num_filas, num_columnas), umbral_longitud)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# El paquete cobertura y las imágenes de ejemplo están en 2023/; así las pruebas corren sin instalarlo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "2023"))
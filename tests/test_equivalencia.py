@@ -0,0 +1,164 @@
+"""
+Compara los análisis de toda la imagen con el cálculo celda a celda de los scripts originales
+(375.py, prueba7.py, ViasDEF.py, VIASDEF2.py y 2VIALDEF.py) en recortes de tamaños que no son
+múltiplos de la cuadrícula.
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from cobertura.cuadrantes import analizar_cuadrantes
+from cobertura.vectorizado import analizar_cuadriculas_vectorizado
+from cobertura.vial import analizar_cuadriculas_vial, analizar_cuadriculas_vial_gris
+
+DIRECTORIO_IMAGENES = os.path.join(os.path.dirname(__file__), os.pardir, "2023")
+
+# (archivo, y, x, alto, ancho) de cada recorte
+RECORTES = [
+    ("coberturaney.jpg", 0, 0, 809, 1062),
+    ("coberturavicente.jpg", 13, 7, 601, 433),
+    ("colorimetria.jpg", 101, 59, 397, 251),
+    ("Slide1.JPG", 5, 3, 719, 1277),
+]
+
+CUADRICULAS = [(30, 15), (7, 5), (13, 11)]
+
+def _cuantizar(porcentaje, umbral_porcentaje):
+    # calcular_cobertura_por_cuadrante de 375.py
+    if porcentaje >= umbral_porcentaje:
+        if porcentaje <= 12.5:
+            return 25
+        elif porcentaje <= 37.5:
+            return 50
+        elif porcentaje <= 62.5:
+            return 75
+        return 100
+    return 0
+
+def _cuantizar_longitud(longitud_total, umbral_longitud):
+    # Final de calcular_cobertura_vial de ViasDEF.py y VIASDEF2.py
+    for factor, valor in ((1, 100), (0.75, 75), (0.5, 50), (0.25, 25)):
+        if longitud_total >= factor * umbral_longitud:
+            return valor
+    return 0
+
+def _celdas(imagen, num_filas, num_columnas):
+    alto_cuadricula = imagen.shape[0] // num_filas
+    ancho_cuadricula = imagen.shape[1] // num_columnas
+    for fila in range(num_filas):
+        for columna in range(num_columnas):
+            y_inicio = fila * alto_cuadricula
+            x_inicio = columna * ancho_cuadricula
+            yield fila, columna, imagen[y_inicio:y_inicio + alto_cuadricula, x_inicio:x_inicio + ancho_cuadricula]
+
+def referencia_375(imagen, num_filas, num_columnas, tipo):
+    """
+    analizar_cuadriculas de 375.py.
+    """
+    resultados = np.zeros((num_filas, num_columnas), dtype=int)
+    for fila, columna, cuadricula in _celdas(imagen, num_filas, num_columnas):
+        if tipo == "vegetal":
+            hsv = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2HSV)
+            mascara = cv2.inRange(hsv, np.array([30, 20, 10]), np.array([90, 255, 255]))
+            umbral = 30
+        elif tipo == "urbanistico":
+            gris = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2GRAY)
+            _, mascara = cv2.threshold(gris, 100, 255, cv2.THRESH_BINARY)
+            umbral = 30
+        else:
+            gris = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2GRAY)
+            bordes = cv2.Canny(gris, 50, 150)
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+            mascara = cv2.dilate(bordes, kernel, iterations=1)
+            umbral = 20
+        resultados[fila, columna] = _cuantizar(cv2.countNonZero(mascara) / mascara.size * 100, umbral)
+    return resultados
+
+def referencia_cuadrantes(imagen, num_filas, num_columnas):
+    """
+    analizar_cuadriculas de prueba7.py.
+    """
+    resultados = np.zeros((num_filas, num_columnas), dtype=int)
+    for fila, columna, cuadricula in _celdas(imagen, num_filas, num_columnas):
+        hsv = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2HSV)
+        mascara = cv2.inRange(hsv, np.array([30, 20, 20]), np.array([90, 255, 255]))
+        alto, ancho = mascara.shape
+        mitad_alto, mitad_ancho = alto // 2, ancho // 2
+        cuadrantes = [mascara[0:mitad_alto, 0:mitad_ancho], mascara[0:mitad_alto, mitad_ancho:ancho],
+                      mascara[mitad_alto:alto, 0:mitad_ancho], mascara[mitad_alto:alto, mitad_ancho:ancho]]
+        resultados[fila, columna] = sum(25 for cuadrante in cuadrantes
+                                        if cv2.countNonZero(cuadrante) / cuadrante.size * 100 >= 30)
+    return resultados
+
+def referencia_vias(imagen, num_filas, num_columnas, umbral_longitud):
+    """
+    analizar_cuadriculas_vial de ViasDEF.py (las líneas se leen con reshape(-1, 4), ya que
+    OpenCV 5 devuelve HoughLinesP con forma (N, 4)).
+    """
+    resultados = np.zeros((num_filas, num_columnas), dtype=int)
+    for fila, columna, cuadricula in _celdas(imagen, num_filas, num_columnas):
+        gris = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2GRAY)
+        bordes = cv2.Canny(gris, 30, 200)
+        lineas = cv2.HoughLinesP(bordes, 1, np.pi / 180, threshold=30, minLineLength=50, maxLineGap=20)
+        longitud_total = 0
+        if lineas is not None:
+            for x1, y1, x2, y2 in lineas.reshape(-1, 4):
+                longitud_total += np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        resultados[fila, columna] = _cuantizar_longitud(longitud_total, umbral_longitud)
+    return resultados
+
+def referencia_vias_gris(imagen, num_filas, num_columnas, umbral_longitud, gris_bajo, gris_alto, suavizar):
+    """
+    analizar_cuadriculas_vial_gris de VIASDEF2.py (y de 2VIALDEF.py con suavizar=True).
+    """
+    resultados = np.zeros((num_filas, num_columnas), dtype=int)
+    for fila, columna, cuadricula in _celdas(imagen, num_filas, num_columnas):
+        hsv = cv2.cvtColor(cuadricula, cv2.COLOR_BGR2HSV)
+        mascara_gris = cv2.inRange(hsv, np.array(gris_bajo), np.array(gris_alto))
+        if suavizar:
+            mascara_gris = cv2.GaussianBlur(mascara_gris, (5, 5), 0)
+        bordes = cv2.Canny(mascara_gris, 50, 150)
+        contornos, _ = cv2.findContours(bordes, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        longitud_total = 0
+        for contorno in contornos:
+            longitud = cv2.arcLength(contorno, closed=False)
+            if longitud > umbral_longitud:
+                longitud_total += longitud
+        resultados[fila, columna] = _cuantizar_longitud(longitud_total, umbral_longitud)
+    return resultados
+
+@pytest.fixture(scope="module", params=RECORTES, ids=lambda recorte: f"{recorte[0]}-{recorte[3]}x{recorte[4]}")
+def imagen(request):
+    archivo, y, x, alto, ancho = request.param
+    completa = cv2.imread(os.path.join(DIRECTORIO_IMAGENES, archivo))
+    assert completa is not None, archivo
+    return np.ascontiguousarray(completa[y:y + alto, x:x + ancho])
+
+@pytest.mark.parametrize("num_filas, num_columnas", CUADRICULAS)
+@pytest.mark.parametrize("tipo", ["vegetal", "urbanistico", "vial"])
+def test_vectorizado_igual_a_375(imagen, tipo, num_filas, num_columnas):
+    esperado = referencia_375(imagen, num_filas, num_columnas, tipo)
+    np.testing.assert_array_equal(analizar_cuadriculas_vectorizado(imagen, num_filas, num_columnas, tipo), esperado)
+
+@pytest.mark.parametrize("num_filas, num_columnas", CUADRICULAS)
+def test_cuadrantes_igual_a_prueba7(imagen, num_filas, num_columnas):
+    np.testing.assert_array_equal(analizar_cuadrantes(imagen, num_filas, num_columnas),
+                                  referencia_cuadrantes(imagen, num_filas, num_columnas))
+
+@pytest.mark.parametrize("num_filas, num_columnas", CUADRICULAS)
+def test_vial_igual_a_viasdef(imagen, num_filas, num_columnas):
+    np.testing.assert_array_equal(analizar_cuadriculas_vial(imagen, num_filas, num_columnas, 50),
+                                  referencia_vias(imagen, num_filas, num_columnas, 50))
+
+@pytest.mark.parametrize("num_filas, num_columnas", CUADRICULAS)
+@pytest.mark.parametrize("gris_bajo, gris_alto, suavizar", [
+    ((0, 0, 50), (180, 50, 220), False),  # VIASDEF2.py
+    ((0, 0, 85), (180, 30, 250), True),  # 2VIALDEF.py
+])
+def test_vial_gris_igual_a_viasdef2(imagen, num_filas, num_columnas, gris_bajo, gris_alto, suavizar):
+    resultado = analizar_cuadriculas_vial_gris(imagen, num_filas, num_columnas, 50, gris_bajo=gris_bajo,
+                                               gris_alto=gris_alto, suavizar=suavizar)
+    esperado = referencia_vias_gris(imagen, num_filas, num_columnas, 50, gris_bajo, gris_alto, suavizar)
+    np.testing.assert_array_equal(resultado, esperado)